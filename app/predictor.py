@@ -6,31 +6,87 @@ The front-end interface looks something like this:
 1. With one click of a button:
     1. makes prediction of the sequence pasted in, using the appropriate model.
 """
-from flask import Flask, render_template, request
-from gsdash.sequence_transformer import to_numeric_rep, standardize_sequence
-from sklearn.externals import joblib
-from sklearn.externals.joblib import Parallel, delayed
-from bokeh.charts import Bar, BoxPlot
-from bokeh.resources import INLINE
-from bokeh.embed import components
-from bokeh.models import HoverTool, ResetTool, WheelZoomTool, PanTool, SaveTool
-from bokeh.plotting import figure
-from gsdash.predutils import predictions, load_model
-from gsdash.bokehutils import yerrorbars
+from flask import Flask, render_template, request, jsonify
+from gsdash.sequence_transformer import to_numeric_rep
+from gsdash.alignment import align_to_consensus, read_fasta_sequence
+from gsdash.residue_matrix import encode
+from gsdash.predutils import (predictions, point_predictions,
+                              batch_predictions)
+from gsdash.prediction_log import PredictionLog, normalize_sequence
+from gsdash.model_store import ModelStore
 
 import numpy as np
+import os
 
-
-drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV',]
+# Heavy dependencies (bokeh, scikit-learn/joblib, scipy) are imported on the
+# code paths that use them, so that worker boot only pays for Flask and numpy.
 
 predictor = Flask(__name__)
 
-
-models_and_drugs = Parallel(n_jobs=-1)(delayed(load_model)(drug)
-                                       for drug in drugs)
-
-models = [mdl for mdl, drug in models_and_drugs]
-drugs = [drug for mdl, drug in models_and_drugs]
+# The log and model paths can be overridden through the environment, so that
+# test and load-test runs (scripts/run_loadgen.py) never touch the real ones.
+prediction_log = PredictionLog(os.environ.get('PREDICTOR_LOG',
+                                              '../data/predictions.sqlite'))
+
+# Versioned models, hot-swapped by a background watcher. See
+# gsdash.model_store for the directory layout.
+model_store = ModelStore(os.environ.get('PREDICTOR_MODELS', '../models'))
+model_store.start_watcher()
+
+consensus = dict()
+
+# Inputs that align to less than this fraction of the consensus, or whose
+# aligned residues are less identical to it than this, are rejected rather
+# than scored: most of their positions would be filled in from the
+# consensus. Real protease sequences in the data are at least 0.73
+# identical.
+MIN_COVERAGE = 0.9
+MIN_IDENTITY = 0.6
+
+
+def get_consensus(protein):
+    """
+    Reads a protein's consensus sequence on first use.
+    """
+    if protein not in consensus:
+        consensus[protein] = read_fasta_sequence(
+            '../data/hiv-{0}-consensus.fasta'.format(protein))
+    return consensus[protein]
+
+
+def align_input(sequences):
+    """
+    Aligns input sequences to the protease consensus.
+
+    Returns the aligned sequences, and an error message naming the inputs
+    that fall below MIN_COVERAGE or MIN_IDENTITY (None if there are none).
+    """
+    aligned, coverage, matches = align_to_consensus(
+        sequences, get_consensus('protease'), return_stats=True)
+    poor = np.flatnonzero((coverage < MIN_COVERAGE) |
+                          (matches < MIN_IDENTITY))
+    if len(poor) == 0:
+        return aligned, None
+    return aligned, ('sequences {0} do not align to the protease consensus '
+                     '(coverage {1}, identity {2}; at least {3} and {4} are '
+                     'required)'.format(poor.tolist(),
+                                        np.round(coverage[poor], 2).tolist(),
+                                        np.round(matches[poor], 2).tolist(),
+                                        MIN_COVERAGE, MIN_IDENTITY))
+
+
+def encode_input(aligned, encoding):
+    """
+    Encodes a list of aligned sequences, one row each, the way the served
+    models were trained: the per-position molecular weight / pKa, or the
+    sparse one-hot (+ k-mer) encoding of gsdash.sparse_encoding.
+    """
+    if encoding['rep'] == 'onehot':
+        from gsdash.sparse_encoding import sparse_encode
+
+        residues = np.array([encode(a) for a in aligned])
+        return sparse_encode(residues, k=encoding.get('k'))
+    return np.array([to_numeric_rep(a, encoding['rep']) for a in aligned])
 
 @predictor.route('/')
 def home():
@@ -38,12 +94,28 @@ def home():
 
 @predictor.route('/predict', methods=['POST'])
 def predict():
-    input_sequence = request.form['sequence']
-    seq = standardize_sequence(to_numeric_rep(input_sequence, 'mw'),
-                               'protease').reshape(1, -1)
-
-
-    preds = predictions(drugs, models, seq)
+    input_sequence = normalize_sequence(request.form['sequence'])
+    # Map the input onto consensus positions, so that insertions and
+    # deletions do not shift the positions the models see.
+    aligned, error = align_input([input_sequence])
+    if error:
+        return jsonify(error=error), 400
+
+    # Hold on to one model set for the whole request, so that a concurrent
+    # swap does not mix model versions.
+    model_set = model_store.get()
+    seq = encode_input(aligned, model_set.encoding)
+    # Fast mode scores each drug with its selected subset of trees.
+    mode = request.form.get('mode', request.args.get('mode', 'full'))
+    n_trees = model_set.fast_trees if mode == 'fast' else None
+    preds = predictions(model_set.drugs, model_set.models, seq,
+                        model_set.outputs, n_trees)
+    prediction_log.record(input_sequence, point_predictions(preds))
+
+    from bokeh.charts import BoxPlot
+    from bokeh.resources import INLINE
+    from bokeh.embed import components
+    from bokeh.models import ResetTool, WheelZoomTool, PanTool, SaveTool
 
     TOOLS = [PanTool(), ResetTool(), WheelZoomTool(), SaveTool()]
 
@@ -60,5 +132,62 @@ def predict():
                            plot_div=div, js_resources=js_resources,
                            css_resources=css_resources,)
 
+@predictor.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """
+    Scores a JSON batch of sequences, without rendering a plot:
+
+        {"sequences": ["PQITLWQRPL...", ...], "mode": "full" or "fast"}
+
+    Returns, for each sequence, every drug's ensemble mean log10(DR) and the
+    bounds of the central 95% interval of the trees.
+    """
+    body = request.get_json(force=True, silent=True)
+    sequences = body.get('sequences') if isinstance(body, dict) else None
+    if not isinstance(sequences, list) or not sequences or \
+            not all(isinstance(s, str) for s in sequences):
+        return jsonify(error='sequences must be a non-empty list of '
+                             'strings'), 400
+    sequences = [normalize_sequence(s) for s in sequences]
+    aligned, error = align_input(sequences)
+    if error:
+        return jsonify(error=error), 400
+
+    model_set = model_store.get()
+    X = encode_input(aligned, model_set.encoding)
+    n_trees = model_set.fast_trees if body.get('mode') == 'fast' else None
+    preds = batch_predictions(model_set.drugs, model_set.models, X,
+                              model_set.outputs, n_trees)
+
+    results = list()
+    for i, sequence in enumerate(sequences):
+        result = {drug: dict(mean=float(p['mean'][i]), low=float(p['low'][i]),
+                             upp=float(p['upp'][i]))
+                  for drug, p in preds.items()}
+        prediction_log.record(sequence, {drug: r['mean']
+                                         for drug, r in result.items()})
+        results.append(result)
+    return jsonify(version=model_set.version, predictions=results)
+
+@predictor.route('/surveillance')
+def surveillance():
+    """
+    Per-drug aggregates over a rolling window of `hours` (default: 24).
+    """
+    try:
+        hours = float(request.args.get('hours', 24))
+    except ValueError:
+        hours = np.nan
+    if not np.isfinite(hours) or hours <= 0:
+        return jsonify(error='hours must be a positive number'), 400
+    window = hours * 3600
+    summary = prediction_log.summary(window)
+    for drug in summary.keys():
+        bins, counts = prediction_log.distribution(drug, window)
+        summary[drug]['bins'] = bins.tolist()
+        summary[drug]['counts'] = counts.tolist()
+    return jsonify(summary)
+
 if __name__ == '__main__':
+    model_store.get()
     predictor.run(debug=True, host='0.0.0.0', port=5550)
@@ -0,0 +1,229 @@
+"""
+Batched alignment of query sequences to a consensus sequence.
+
+`standardize_sequence` linearly stretches a sequence to the consensus length,
+so a single insertion or deletion shifts every position after it. The
+functions here instead map each consensus position to the query residue that
+aligns to it, before the sequence is encoded.
+
+Two paths are used:
+
+- Fast path: a query of the same length as the consensus maps onto it
+  one-to-one if it is at least `identity` identical to it position-by-
+  position, and every run of `window` consecutive positions (every
+  `window`-mer) is anchored by at least half of its residues matching. An
+  insertion and a deletion of equal size shift the positions between them;
+  unless they are less than `window` apart, the shifted stretch fails the
+  anchor check and the query is aligned instead.
+- Otherwise, the query is globally aligned to the consensus with a banded
+  Needleman-Wunsch. The DP is vectorized with NumPy over the whole batch and
+  the whole band at once: only the query rows are iterated over, and gaps
+  within a row are resolved with a running maximum instead of a loop.
+"""
+import numpy as np
+
+MATCH = 1
+MISMATCH = -1
+GAP = -2
+NEG_INF = -1 << 30
+
+# Traceback pointers.
+DIAG, UP, LEFT = 0, 1, 2
+
+
+def read_fasta_sequence(path):
+    """
+    Returns the first sequence in a FASTA file, as an upper-case string.
+    """
+    lines = list()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('>'):
+                if lines:
+                    break
+                continue
+            lines.append(line)
+    return ''.join(lines).upper()
+
+
+def to_codes(sequences):
+    """
+    Packs a list of strings into a zero-padded uint8 matrix of ASCII codes,
+    and returns it together with the sequence lengths.
+    """
+    lengths = np.array([len(s) for s in sequences], dtype=int)
+    codes = np.zeros((len(sequences), max(lengths.max(), 1)), dtype=np.uint8)
+    for i, s in enumerate(sequences):
+        codes[i, :len(s)] = np.frombuffer(s.encode('ascii'), dtype=np.uint8)
+    return codes, lengths
+
+
+def banded_alignment(queries, lengths, consensus, band=10):
+    """
+    Globally aligns a batch of queries to the consensus within a band of
+    diagonals, and returns the query position aligned to every consensus
+    position.
+
+    Parameters:
+    ===========
+    - queries: (np.array) B x Lq uint8 query codes, zero-padded.
+    - lengths: (np.array) the B query lengths.
+    - consensus: (np.array) Lc uint8 consensus codes.
+    - band: (int) extra diagonals on either side of those needed to reach the
+            end of every query.
+
+    Returns:
+    ========
+    - mapping: (np.array) B x Lc int array; the query index aligned to each
+               consensus position, or -1 where the query has a deletion.
+    """
+    B, Lq = queries.shape
+    Lc = len(consensus)
+
+    # Diagonal d = j - i, for query index i and consensus index j. The band
+    # must contain the end cell (Lq_b, Lc) of every query.
+    dmin = min(0, Lc - lengths.max()) - band
+    dmax = max(0, Lc - lengths.min()) + band
+    d = np.arange(dmin, dmax + 1)
+    nd = len(d)
+    k = np.arange(nd)
+
+    H = np.full((B, nd), NEG_INF, dtype=np.int64)
+    # Row 0: leading deletions in the query.
+    valid = (d >= 0) & (d <= Lc)
+    H[:, valid] = d[valid] * GAP
+    pointers = np.full((Lq + 1, B, nd), LEFT, dtype=np.uint8)
+
+    padded = np.concatenate([np.zeros(1, dtype=np.uint8), consensus])
+    for i in range(1, Lq + 1):
+        j = i + d
+        valid = (j >= 0) & (j <= Lc)
+
+        # Diagonal move: same diagonal, previous row.
+        cons = padded[np.clip(j, 0, Lc)]
+        score = np.where(queries[:, i - 1, None] == cons, MATCH, MISMATCH)
+        diag = np.where(j >= 1, H + score, NEG_INF)
+        # Up move (query insertion): diagonal d + 1 on the previous row.
+        up = np.full_like(H, NEG_INF)
+        up[:, :-1] = H[:, 1:] + GAP
+        best = np.maximum(diag, up)
+        ptr = np.where(up > diag, UP, DIAG).astype(np.uint8)
+
+        # Left moves (query deletions) along the row, resolved with a running
+        # maximum: H[k] = max_m<=k (best[m] + (k - m) * GAP).
+        best[:, ~valid] = NEG_INF
+        shifted = np.maximum.accumulate(best - k * GAP, axis=1) + k * GAP
+        ptr[shifted > best] = LEFT
+        H = np.where(valid, shifted, NEG_INF)
+        pointers[i] = ptr
+
+    # Trace back all queries at once, from (Lq_b, Lc) to (0, 0).
+    mapping = np.full((B, Lc), -1, dtype=int)
+    rows = np.arange(B)
+    i = lengths.copy()
+    j = np.full(B, Lc)
+    while True:
+        active = (i > 0) | (j > 0)
+        if not active.any():
+            break
+        kk = np.clip(j - i - dmin, 0, nd - 1)
+        ptr = pointers[i, rows, kk]
+        ptr = np.where(i == 0, LEFT, np.where(j == 0, UP, ptr))
+        is_diag = active & (ptr == DIAG)
+        mapping[rows[is_diag], j[is_diag] - 1] = i[is_diag] - 1
+        i = i - (active & (ptr != LEFT))
+        j = j - (active & (ptr != UP))
+
+    return mapping
+
+
+def fast_path(queries, consensus, identity=0.85, window=10):
+    """
+    Returns which equal-length queries can be mapped onto the consensus
+    without aligning them, and their fraction of identical positions.
+
+    Parameters:
+    ===========
+    - queries: (np.array) B x Lc uint8 query codes.
+    - consensus: (np.array) Lc uint8 consensus codes.
+    - identity: (float) minimum fraction of identical positions.
+    - window: (int) length of the windows that must each be at least half
+              identical.
+
+    Returns:
+    ========
+    - ungapped: (np.array) B booleans.
+    - matches: (np.array) B fractions of identical positions.
+    """
+    same = queries == consensus
+    matches = same.mean(axis=1)
+    window = min(window, len(consensus))
+    totals = np.concatenate([np.zeros((len(same), 1), dtype=int),
+                             np.cumsum(same, axis=1)], axis=1)
+    anchored = (totals[:, window:] - totals[:, :-window]).min(axis=1) \
+        >= window / 2
+    return (matches >= identity) & anchored, matches
+
+
+def align_to_consensus(sequences, consensus, identity=0.85, window=10,
+                       band=10, batch_size=256, return_stats=False):
+    """
+    Maps a batch of sequences onto consensus positions.
+
+    Parameters:
+    ===========
+    - sequences: (list) amino acid strings.
+    - consensus: (str) the consensus sequence.
+    - identity, window: (float, int) see `fast_path`.
+    - band: (int) see `banded_alignment`.
+    - batch_size: (int) number of queries aligned together, which bounds the
+                  memory used by the traceback pointers.
+    - return_stats: (bool) also return the coverage and identity of each
+                    query.
+
+    Returns:
+    ========
+    - aligned: (list) strings of the consensus length. Positions deleted in
+               the query are filled with the consensus residue; insertions
+               relative to the consensus are dropped.
+    - coverage: (np.array) if `return_stats`, the fraction of consensus
+                positions aligned to a query residue (rather than filled in).
+    - matches: (np.array) if `return_stats`, the fraction of those aligned
+               residues that are identical to the consensus (0 if none).
+    """
+    sequences = [s.upper() for s in sequences]
+    cons_codes = np.frombuffer(consensus.encode('ascii'), dtype=np.uint8)
+    Lc = len(consensus)
+
+    aligned = [None] * len(sequences)
+    coverage = np.zeros(len(sequences))
+    matches = np.zeros(len(sequences))
+    same_length = [n for n, s in enumerate(sequences) if len(s) == Lc]
+    if same_length:
+        codes, _ = to_codes([sequences[n] for n in same_length])
+        ungapped, identical = fast_path(codes, cons_codes, identity, window)
+        for n, ok, m in zip(same_length, ungapped, identical):
+            if ok:
+                aligned[n] = sequences[n]
+                coverage[n], matches[n] = 1., m
+    slow = [n for n in range(len(sequences)) if aligned[n] is None]
+
+    for start in range(0, len(slow), batch_size):
+        batch = slow[start:start + batch_size]
+        codes, lengths = to_codes([sequences[n] for n in batch])
+        mapping = banded_alignment(codes, lengths, cons_codes, band=band)
+        rows = np.arange(len(batch))[:, None]
+        mapped = mapping >= 0
+        projected = np.where(mapped, codes[rows, np.maximum(mapping, 0)],
+                             cons_codes)
+        n_mapped = mapped.sum(axis=1)
+        coverage[batch] = n_mapped / Lc
+        matches[batch] = (mapped & (projected == cons_codes)).sum(axis=1) / \
+            np.maximum(n_mapped, 1)
+        for n, row in zip(batch, projected):
+            aligned[n] = row.astype(np.uint8).tobytes().decode('ascii')
+
+    if return_stats:
+        return aligned, coverage, matches
+    return aligned
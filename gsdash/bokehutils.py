@@ -4,7 +4,7 @@ def iterable_shape(iterable):
     """
     Returns a numpy array version of the iterable, as well as its shape.
     """
-    iterable = np.array(iterable)
+    iterable = np.asarray(iterable)
 
     if len(iterable.shape) == 1:
         iterable = iterable.reshape(iterable.shape[0], -1)
@@ -16,29 +16,40 @@ def yerrorbars(data, errors, xdata_label, ydata_label, sort=False):
     """
     Generates y-error bars properly formatted for input into Bokeh.
 
+    Parameters:
+    ===========
+    - data: (dict-like) mapping of column labels to x- and y-data.
+    - errors: (scalar, list, tuple or np.array) either a single uniform error,
+              N symmetric errors, or an Nx2 array of (lower, upper) errors.
+    - xdata_label: (str) the key for the x-axis data in `data`.
+    - ydata_label: (str) the key for the y-axis data in `data`.
+    - sort: (bool) whether to order the bars by the x-axis data.
 
+    Returns:
+    ========
+    - xs, ys: (np.array) Nx2 arrays; row i holds the two x (resp. y)
+              coordinates of the ith error bar, ready to be placed into a
+              ColumnDataSource for `multi_line`.
     """
-    data_len = len(data[xdata_label])
-    xdata = np.array(data[xdata_label])
-    ydata = np.array(data[ydata_label])
-    xs = [[i+1]*2 for i in range(data_len)]
+    xdata = np.asarray(data[xdata_label])
+    ydata = np.asarray(data[ydata_label], dtype=float)
+    data_len = len(xdata)
+
+    xs = np.repeat(np.arange(1, data_len + 1, dtype=float), 2)\
+        .reshape(data_len, 2)
 
     # There are a few cases that we are defining as acceptable.
 
     # Case 1: Uniform error bars across all x-axis samples.
-    if isinstance(errors, int) or isinstance(errors, float):
-        ys = [[ydata[i] - errors,
-               ydata[i] + errors]
-              for i in range(data_len)]
+    if np.ndim(errors) == 0:
+        lower = upper = float(errors)
 
     # Case 2: Error bars are different per sample and are provided as an
-    # iterable.
-    if hasattr(errors, "__iter__"):
+    # iterable (list, tuple or np.array).
+    else:
         # Firstly, convert the errors to a numpy array. This allows easy
         # checking of shape.
-        if isinstance(errors, list) or isinstance(errors, tuple):
-            errors, err_shape = iterable_shape(errors)
-            print(errors, err_shape)
+        errors, err_shape = iterable_shape(errors)
 
         # Next, check to make sure that the errors provided make sense.
         assert err_shape[0] == data_len,\
@@ -47,19 +58,20 @@ def yerrorbars(data, errors, xdata_label, ydata_label, sort=False):
             "errors provided must be a single row or two rows."
 
         # Case 2a: the error bars are symmetric around the data point.
-        if err_shape[1] == 1:
-            ys = [[ydata[i] - errors[i],
-                   ydata[i] + errors[i]]
-                  for i in range(data_len)]
         # Case 2b: the error bars are non-symmetric around the data point.
-        # In this case, the errors are provided in the shape of 2xN.
-        elif err_shape[1] == 2:
-            ys = [[ydata[i] - errors[i, 0],
-                   ydata[i] + errors[i, 1]]
-                  for i in range(data_len)]
+        # In this case, the errors are provided in the shape of Nx2.
+        lower = errors[:, 0]
+        upper = errors[:, -1]
+
+    ys = np.empty((data_len, 2))
+    np.subtract(ydata, lower, out=ys[:, 0])
+    np.add(ydata, upper, out=ys[:, 1])
 
     if sort:
-        xs = [x for (label, x) in sorted(zip(data[xdata_label], xs))]
-        ys = [y for (label, y) in sorted(zip(data[xdata_label], ys))]
+        # A stable sort keeps ties in their original order, as the previous
+        # sorted(zip(...)) implementation did.
+        order = np.argsort(xdata, kind='mergesort')
+        xs = xs[order]
+        ys = ys[order]
 
     return xs, ys
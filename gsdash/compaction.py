@@ -0,0 +1,109 @@
+"""
+Training-data compaction: collapses duplicate (feature row, target) pairs
+into unique rows with summed sample weights.
+
+For a single decision tree, or a tree ensemble without bootstrapping,
+fitting on the compacted rows with `sample_weight` is equivalent to fitting
+on the duplicated rows, but fit time and memory scale with the number of
+unique genotypes instead of the number of raw rows.
+
+Bootstrapped ensembles (e.g. RandomForestRegressor's default) are not
+equivalent: each tree draws n_unique rows rather than n_raw, so a row with
+weight 3 is left out of about 37% of the trees instead of about 5%. Whether
+that costs accuracy is an empirical question; scripts/compare_compaction.py
+checks the held-out R2 of both fits.
+"""
+import numpy as np
+
+
+def compact(X, Y, sample_weight=None):
+    """
+    Collapses duplicate (X row, Y) pairs.
+
+    Parameters:
+    ===========
+    - X: (np.array) n_samples x n_features feature matrix, or a
+         scipy.sparse matrix (see `compact_sparse`).
+    - Y: (np.array) n_samples targets, or n_samples x n_outputs.
+    - sample_weight: (np.array) n_samples weights; defaults to 1 per row.
+
+    Returns:
+    ========
+    - X_unique: (np.array) the unique rows of X, in order of first appearance.
+    - Y_unique: (np.array) the matching targets.
+    - weights: (np.array) the summed weight of each unique row.
+    - inverse: (np.array) for each input row, the index of its unique row.
+    """
+    if hasattr(X, 'tocsr'):
+        return compact_sparse(X, Y, sample_weight)
+
+    X = np.asarray(X)
+    Y = np.asarray(Y)
+    n = len(X)
+    if sample_weight is None:
+        sample_weight = np.ones(n)
+    sample_weight = np.asarray(sample_weight, dtype=float)
+
+    # Deduplicate on the raw bytes of each (X, Y) row, viewed as a single
+    # opaque item, so that np.unique does one sort over n items.
+    XY = np.ascontiguousarray(np.column_stack([X.reshape(n, -1)
+                                               .astype(float),
+                                               Y.reshape(n, -1)
+                                               .astype(float)]))
+    # Make -0.0 and 0.0 compare equal.
+    XY += 0.0
+    rows = XY.view(np.dtype((np.void, XY.dtype.itemsize * XY.shape[1])))\
+        .ravel()
+    _, first, inverse = np.unique(rows, return_index=True,
+                                  return_inverse=True)
+
+    # Renumber the unique rows in order of first appearance.
+    order = np.argsort(first)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    inverse = rank[inverse.ravel()]
+    first = first[order]
+
+    weights = np.bincount(inverse, weights=sample_weight,
+                          minlength=len(first))
+
+    return X[first], Y[first], weights, inverse
+
+
+def compact_sparse(X, Y, sample_weight=None):
+    """
+    `compact` for a scipy.sparse feature matrix, without densifying it.
+
+    Rows are compared on their non-zero columns and values, after summing
+    duplicate entries and dropping explicit zeros, so rows that are equal
+    as matrices are merged however they were built. Returns X_unique as a
+    CSR matrix; the other outputs are as for `compact`.
+    """
+    X = X.tocsr(copy=True)
+    X.sum_duplicates()
+    X.eliminate_zeros()
+    Y = np.asarray(Y)
+    n = X.shape[0]
+    if sample_weight is None:
+        sample_weight = np.ones(n)
+    sample_weight = np.asarray(sample_weight, dtype=float)
+
+    # Make -0.0 and 0.0 compare equal, as in `compact`.
+    data = X.data.astype(float) + 0.0
+    targets = Y.reshape(n, -1).astype(float) + 0.0
+    unique = dict()
+    first = list()
+    inverse = np.empty(n, dtype=np.int64)
+    for i in range(n):
+        start, end = X.indptr[i], X.indptr[i + 1]
+        key = (X.indices[start:end].tobytes(), data[start:end].tobytes(),
+               targets[i].tobytes())
+        j = unique.setdefault(key, len(first))
+        if j == len(first):
+            first.append(i)
+        inverse[i] = j
+
+    weights = np.bincount(inverse, weights=sample_weight,
+                          minlength=len(first))
+
+    return X[first], Y[first], weights, inverse
@@ -0,0 +1,292 @@
+"""
+A model evaluation harness that avoids refitting where it can.
+
+- Bagged ensembles (random forests and extra trees with bootstrap=True,
+  BaggingRegressor) are fit once, and every sample is scored only by the
+  members that did not see it during training (out-of-bag).
+- Other models are scored with k-fold cross-validation, with the folds
+  fit in parallel.
+
+Fold assignments and per-fold (or out-of-bag) predictions are cached on disk,
+keyed by a hash of the data and of the model's parameters (and, for the
+predictions, the interval percentiles), so re-running a report only fits
+what has changed.
+
+For ensembles of independently trained members, the spread of the members'
+predictions is also checked for calibration: the fraction of samples whose
+true value falls inside the central p% interval of the member predictions
+(the `predutils.intervals` bounds) should be close to p%.
+"""
+from hashlib import sha1
+
+import numpy as np
+import os
+import warnings
+
+PERCENTILES = (50, 80, 95)
+
+
+def data_hash(X, Y, sample_weight=None):
+    h = sha1()
+    arrays = [X, Y, sample_weight]
+    if hasattr(X, 'indptr'):
+        # A scipy.sparse CSR matrix: hash its shape and its arrays.
+        h.update(str(X.shape).encode('ascii'))
+        arrays = [X.data, X.indices, X.indptr, Y, sample_weight]
+    for a in arrays:
+        if a is not None:
+            a = np.ascontiguousarray(a, dtype=float)
+            h.update(str(a.shape).encode('ascii'))
+            h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def model_hash(mdl):
+    params = sorted((k, repr(v)) for k, v in mdl.get_params().items())
+    key = repr((type(mdl).__name__, params))
+    return sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def percentiles_key(percentiles):
+    """
+    Names a set of interval percentiles in cache file names, as the cached
+    interval bounds are only valid for the percentiles they were computed
+    for.
+    """
+    return '_'.join('{0:g}'.format(p) for p in percentiles)
+
+
+def is_bagged(mdl):
+    """
+    Returns True if the model is a bagged ensemble with out-of-bag samples.
+    """
+    return has_independent_members(mdl) and getattr(mdl, 'bootstrap', False)
+
+
+def has_independent_members(mdl):
+    """
+    Returns True if the model's members are trained independently, so that
+    the spread of their predictions is a meaningful uncertainty interval.
+    """
+    return type(mdl).__name__ in ('RandomForestRegressor',
+                                  'ExtraTreesRegressor',
+                                  'BaggingRegressor')
+
+
+def member_predictions(mdl, X):
+    """
+    Returns the n_members x n_samples predictions of each ensemble member.
+    """
+    if hasattr(mdl, 'estimators_features_'):
+        return np.array([est.predict(X[:, features]) for est, features
+                         in zip(mdl.estimators_, mdl.estimators_features_)])
+    return np.array([est.predict(X) for est in mdl.estimators_])
+
+
+def _cached(path, compute):
+    """
+    Loads the arrays saved at `path`, or computes and saves them.
+    """
+    if path is not None and os.path.exists(path):
+        with np.load(path) as f:
+            return dict(f)
+    result = compute()
+    if path is not None:
+        np.savez(path, **result)
+    return result
+
+
+def _interval_bounds(member_preds, percentiles):
+    """
+    Returns an array of (low, upp) bounds for each percentile and sample,
+    ignoring NaN member predictions.
+    """
+    bounds = list()
+    with warnings.catch_warnings():
+        # Samples without any member prediction get NaN bounds.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for p in percentiles:
+            low = (100 - p) / 2
+            bounds.append(np.nanpercentile(member_preds, [low, 100 - low],
+                                           axis=0))
+    return np.array(bounds)
+
+
+def oob_predictions(mdl, X, Y, sample_weight=None, percentiles=PERCENTILES):
+    """
+    Fits a bagged ensemble once, and returns each sample's out-of-bag mean
+    prediction and out-of-bag member intervals.
+    """
+    mdl.fit(X, Y, sample_weight=sample_weight)
+    member_preds = member_predictions(mdl, X)
+
+    # Mask out every member's in-bag samples.
+    for preds, samples in zip(member_preds, mdl.estimators_samples_):
+        preds[samples] = np.nan
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        pred = np.nanmean(member_preds, axis=0)
+    return dict(pred=pred,
+                bounds=_interval_bounds(member_preds, percentiles))
+
+
+def _fit_fold(mdl, X, Y, sample_weight, train, test, percentiles, path):
+    from sklearn.base import clone
+
+    def compute():
+        fold_mdl = clone(mdl)
+        fit_weight = None if sample_weight is None else sample_weight[train]
+        fold_mdl.fit(X[train], Y[train], sample_weight=fit_weight)
+        result = dict(pred=fold_mdl.predict(X[test]))
+        if has_independent_members(fold_mdl):
+            result['bounds'] = _interval_bounds(
+                member_predictions(fold_mdl, X[test]), percentiles)
+        return result
+
+    return _cached(path, compute)
+
+
+def fold_assignments(n_samples, cv, random_state, cache_dir=None, key=''):
+    """
+    Returns a random fold index for each sample, cached on disk so that all
+    models evaluated on the same data share the same folds.
+    """
+    path = None
+    if cache_dir is not None:
+        path = os.path.join(cache_dir, 'folds-{0}-{1}-{2}.npz'.format(
+            key, cv, random_state))
+
+    def compute():
+        rng = np.random.RandomState(random_state)
+        return dict(folds=rng.permutation(n_samples) % cv)
+
+    return _cached(path, compute)['folds']
+
+
+def cv_predictions(mdl, X, Y, sample_weight=None, cv=5, random_state=0,
+                   percentiles=PERCENTILES, n_jobs=-1, cache_dir=None):
+    """
+    Returns each sample's held-out prediction (and member intervals, where
+    they apply) from k-fold cross-validation, fitting the folds in parallel.
+    """
+    from joblib import Parallel, delayed
+
+    dkey = data_hash(X, Y, sample_weight)
+    mkey = model_hash(mdl)
+    folds = fold_assignments(X.shape[0], cv, random_state, cache_dir, dkey)
+
+    paths = [None] * cv
+    if cache_dir is not None:
+        paths = [os.path.join(cache_dir, 'cv-{0}-{1}-{2}-{3}-{4}.npz'.format(
+            dkey, mkey, random_state, percentiles_key(percentiles), k))
+            for k in range(cv)]
+
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_fit_fold)(mdl, X, Y, sample_weight,
+                           np.where(folds != k)[0], np.where(folds == k)[0],
+                           percentiles, paths[k])
+        for k in range(cv))
+
+    pred = np.empty(X.shape[0])
+    bounds = np.full((len(percentiles), 2, X.shape[0]), np.nan)
+    for k, result in enumerate(results):
+        test = folds == k
+        pred[test] = result['pred']
+        if 'bounds' in result:
+            bounds[:, :, test] = result['bounds']
+    return dict(pred=pred, bounds=bounds)
+
+
+def evaluate(mdl, X, Y, sample_weight=None, cv=5, random_state=0,
+             percentiles=PERCENTILES, n_jobs=-1, cache_dir=None):
+    """
+    Returns held-out metrics for a model: out-of-bag for bagged ensembles,
+    k-fold cross-validation otherwise.
+
+    Parameters:
+    ===========
+    - mdl: (sklearn estimator) an unfitted regressor. It is left unfitted:
+           only clones of it are fit, and cached results are not refit.
+    - X, Y: (np.array) the features and targets. X may also be a
+            scipy.sparse matrix (e.g. from gsdash.sparse_encoding); it is
+            kept sparse, as CSR.
+    - sample_weight: (np.array) optional sample weights, e.g. from
+                     custom_funcs.compact_data. Metrics are weighted too.
+    - cv, random_state: the number of folds and the fold seed, when
+                        cross-validating.
+    - percentiles: (iterable) nominal interval widths to check calibration
+                   of.
+    - n_jobs: (int) parallel folds.
+    - cache_dir: (str) directory for cached folds and predictions; None
+                 disables caching.
+
+    Returns:
+    ========
+    - metrics: (dict) with keys `method` ('oob' or 'cv'), `n`, `r2`, `rmse`
+               and `coverage`, a dict of nominal percentile -> fraction of
+               samples inside the member interval (NaN if not applicable).
+    """
+    from sklearn.base import clone
+
+    if hasattr(X, 'tocsr'):
+        X = X.tocsr().astype(float)
+    else:
+        X = np.asarray(X, dtype=float)
+    Y = np.asarray(Y, dtype=float)
+    if sample_weight is not None:
+        sample_weight = np.asarray(sample_weight, dtype=float)
+    if cache_dir is not None and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    if is_bagged(mdl):
+        method = 'oob'
+        path = None
+        if cache_dir is not None:
+            path = os.path.join(cache_dir, 'oob-{0}-{1}-{2}.npz'.format(
+                data_hash(X, Y, sample_weight), model_hash(mdl),
+                percentiles_key(percentiles)))
+        result = _cached(path, lambda: oob_predictions(
+            clone(mdl), X, Y, sample_weight, percentiles))
+    else:
+        method = 'cv'
+        result = cv_predictions(mdl, X, Y, sample_weight, cv, random_state,
+                                percentiles, n_jobs, cache_dir)
+
+    w = np.ones(len(Y)) if sample_weight is None else sample_weight
+    # Samples that were in-bag for every member have no OOB prediction.
+    scored = ~np.isnan(result['pred'])
+    y, pred, w = Y[scored], result['pred'][scored], w[scored]
+    mse = np.average((y - pred) ** 2, weights=w)
+    var = np.average((y - np.average(y, weights=w)) ** 2, weights=w)
+
+    coverage = dict()
+    for p, (low, upp) in zip(percentiles, result['bounds']):
+        low, upp = low[scored], upp[scored]
+        if np.isnan(low).all():
+            coverage[p] = np.nan
+        else:
+            inside = (y >= low) & (y <= upp)
+            coverage[p] = np.average(inside, weights=w)
+
+    return dict(method=method, n=int(scored.sum()), r2=1 - mse / var,
+                rmse=np.sqrt(mse), coverage=coverage)
+
+
+def format_report(metrics):
+    """
+    Formats a dict of name -> metrics (from `evaluate`) as a text table.
+    """
+    percentiles = sorted(next(iter(metrics.values()))['coverage'].keys())
+    header = '{0:>8} {1:>6} {2:>6} {3:>7} {4:>7} '.format(
+        'name', 'method', 'n', 'R2', 'RMSE')
+    header += ' '.join('{0:>7}'.format('cov{0}'.format(p))
+                       for p in percentiles)
+    lines = [header]
+    for name, m in metrics.items():
+        line = '{0:>8} {1:>6} {2:>6} {3:7.3f} {4:7.3f} '.format(
+            name, m['method'], m['n'], m['r2'], m['rmse'])
+        line += ' '.join('{0:7.3f}'.format(m['coverage'][p])
+                         for p in percentiles)
+        lines.append(line)
+    return '\n'.join(lines)
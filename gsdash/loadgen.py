@@ -0,0 +1,141 @@
+"""
+A small load generator for the Flask services.
+
+Requests are sent by a pool of worker threads, either in-process through a
+Flask test client (`client_sender`) or over HTTP (`http_sender`, standard
+library only), so that no outside service is needed. Each concurrency level
+reports throughput and latency percentiles as a plain dict, ready to be
+dumped as JSON and compared between commits.
+"""
+from itertools import count
+from threading import Thread
+
+import json
+import numpy as np
+import time
+
+PERCENTILES = (50, 95, 99)
+
+
+def client_sender(app, path, payloads, json_body=True):
+    """
+    Returns a function that sends one request to `path` of a Flask app
+    in-process, and returns its status code. Every call draws the next of
+    `payloads` (JSON bodies, or form dicts if not `json_body`), cycling.
+    """
+    counter = count()
+
+    def send():
+        payload = payloads[next(counter) % len(payloads)]
+        # One test client per call: test clients are not thread-safe.
+        with app.test_client() as client:
+            if json_body:
+                response = client.post(path, json=payload)
+            else:
+                response = client.post(path, data=payload)
+        return response.status_code
+
+    return send
+
+
+def http_sender(url, payloads, json_body=True, timeout=60):
+    """
+    Like `client_sender`, but POSTs to a running service at `url`, e.g.
+    http://localhost:5550/predict/batch.
+    """
+    from urllib.error import HTTPError
+    from urllib.parse import urlencode
+    from urllib.request import Request, urlopen
+
+    counter = count()
+
+    def send():
+        payload = payloads[next(counter) % len(payloads)]
+        if json_body:
+            data = json.dumps(payload).encode('utf-8')
+            headers = {'Content-Type': 'application/json'}
+        else:
+            data = urlencode(payload).encode('utf-8')
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        try:
+            with urlopen(Request(url, data, headers), timeout=timeout) as r:
+                r.read()
+                return r.status
+        except HTTPError as e:
+            return e.code
+
+    return send
+
+
+def latency_summary(latencies, statuses, elapsed, percentiles=PERCENTILES):
+    """
+    Summarises one load level.
+
+    Parameters:
+    ===========
+    - latencies: (list) per-request latencies, in seconds.
+    - statuses: (list) per-request HTTP status codes, or None for requests
+                that raised.
+    - elapsed: (float) wall-clock duration of the level, in seconds.
+
+    Returns:
+    ========
+    - summary: (dict) with the number of `requests` and `errors` (non-2xx
+               or raised), `throughput` in successful requests per second,
+               and the latency percentiles in milliseconds (`p50`, ...) of
+               the successful requests.
+    """
+    latencies = np.asarray(latencies, dtype=float)
+    ok = np.array([s is not None and 200 <= s < 300 for s in statuses],
+                  dtype=bool)
+    summary = dict(requests=len(latencies), errors=int((~ok).sum()),
+                   elapsed=elapsed, throughput=ok.sum() / elapsed)
+    for p in percentiles:
+        summary['p{0}'.format(p)] = (float(np.percentile(latencies[ok], p))
+                                     * 1000 if ok.any() else None)
+    return summary
+
+
+def run_load(send, concurrency, n_requests, warmup=0):
+    """
+    Sends `n_requests` requests from `concurrency` threads, as fast as they
+    complete, after `warmup` unmeasured requests.
+
+    Returns the `latency_summary` of the level, with `concurrency` added.
+    """
+    for _ in range(warmup):
+        send()
+
+    latencies = [None] * n_requests
+    statuses = [None] * n_requests
+
+    # Each worker takes every `concurrency`-th request slot.
+    def worker(start):
+        for i in range(start, n_requests, concurrency):
+            t = time.perf_counter()
+            try:
+                statuses[i] = send()
+            except Exception:
+                statuses[i] = None
+            latencies[i] = time.perf_counter() - t
+
+    threads = [Thread(target=worker, args=(k,)) for k in range(concurrency)]
+    t = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t
+
+    summary = latency_summary(latencies, statuses, elapsed)
+    summary['concurrency'] = concurrency
+    return summary
+
+
+def latency_curve(send, levels, n_requests, warmup=0):
+    """
+    Runs `run_load` at each concurrency level, returning a list of
+    summaries: the throughput and latency curves.
+    """
+    return [run_load(send, c, n_requests, warmup if i == 0 else 0)
+            for i, c in enumerate(levels)]
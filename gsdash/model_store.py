@@ -0,0 +1,347 @@
+"""
+A versioned on-disk model store that can be hot-swapped under a running
+predictor.
+
+Layout of the model root directory:
+
+    models/
+        2017-02-01T120000/
+            manifest.json
+            FPV.pkl
+            ATV.pkl
+            ...
+        2017-03-01T090000/
+            ...
+
+A version directory is only considered complete once its `manifest.json`
+exists, so the manifest must be written last (`write_manifest` does this
+atomically). Versions are ordered by directory name; the greatest complete
+version that loads is the one that gets served. A version that fails its
+hash check or fails to load is remembered and skipped, falling back to the
+next older version, until its manifest is rewritten.
+
+The manifest records, for each drug, the model file, its sha256 hash and its
+training date:
+
+    {"version": "2017-03-01T090000",
+     "models": [{"drug": "FPV", "file": "FPV.pkl", "sha256": "...",
+                 "trained": "2017-03-01"}, ...]}
+
+For a multi-output model (see gsdash.multioutput), several drugs point to the
+same file, and each entry also records the drug's "output" column. Each file
+is loaded only once.
+
+An entry may also record "fast_trees", the number of trees served in fast
+mode (see gsdash.tree_subset).
+
+The manifest may also record the "encoding" the models were trained on, e.g.
+{"rep": "onehot", "k": 2} for the sparse one-hot + 2-mer encoding of
+gsdash.sparse_encoding. Without it, models take the molecular weight
+representation, {"rep": "mw"}.
+
+Models are loaded off the request path: `start_watcher` loads the current
+version in its thread straight away, then polls for new ones. Requests take
+a reference to the current `ModelSet` once and use it for their whole
+duration. Swapping in a new version is a single reference assignment, so
+in-flight requests finish on the version they started with, and the old
+models are freed once the last of those requests drops its reference.
+"""
+from hashlib import sha256
+from threading import Event, Lock, Thread
+
+import json
+import os
+import traceback
+
+MANIFEST = 'manifest.json'
+
+
+def file_hash(path):
+    """
+    Returns the sha256 hex digest of a file.
+    """
+    h = sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def write_manifest(version_dir, drug_files, trained, fast_trees=None,
+                   encoding=None):
+    """
+    Writes the manifest for a version directory whose model files have
+    already been written.
+
+    Parameters:
+    ===========
+    - version_dir: (str) path to the version directory.
+    - drug_files: (list) of (drug, filename) pairs, filenames relative to
+                  `version_dir`; or (drug, filename, output) triples for
+                  drugs served from a column of a multi-output model.
+    - trained: (str) the training date.
+    - fast_trees: (dict) optional drug -> number of trees for fast mode.
+    - encoding: (dict) optional input encoding of the models.
+    """
+    manifest = dict(version=os.path.basename(os.path.normpath(version_dir)),
+                    models=list())
+    if encoding is not None:
+        manifest['encoding'] = encoding
+    hashes = dict()
+    for entry in drug_files:
+        drug, fname = entry[:2]
+        if fname not in hashes:
+            hashes[fname] = file_hash(os.path.join(version_dir, fname))
+        record = dict(drug=drug, file=fname, trained=trained,
+                      sha256=hashes[fname])
+        if len(entry) == 3:
+            record['output'] = entry[2]
+        if fast_trees and drug in fast_trees:
+            record['fast_trees'] = int(fast_trees[drug])
+        manifest['models'].append(record)
+
+    # Write then rename, so that watchers never see a partial manifest.
+    tmp_path = os.path.join(version_dir, MANIFEST + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.rename(tmp_path, os.path.join(version_dir, MANIFEST))
+
+    return manifest
+
+
+def migrate_legacy(root, drugs, legacy_dir='base'):
+    """
+    Serves models deployed in the old `<root>/base/<drug>/<drug>.pkl` layout
+    without retraining: writes a version directory that hard-links (or,
+    where links are not supported, copies) the existing pickles, then its
+    manifest.
+
+    The version is named after the newest pickle's modification time, so
+    that any later retrained version takes precedence.
+
+    Parameters:
+    ===========
+    - root: (str) the model root directory.
+    - drugs: (list) the drugs to migrate, in display order. Drugs without a
+             legacy pickle are skipped.
+    - legacy_dir: (str) the legacy directory, relative to `root`.
+
+    Returns:
+    ========
+    - version: (str) the new version name, or None if there was nothing to
+               migrate.
+    """
+    import shutil
+    from datetime import datetime
+
+    paths = [(drug, os.path.join(root, legacy_dir, drug,
+                                 '{0}.pkl'.format(drug)))
+             for drug in drugs]
+    paths = [(drug, path) for drug, path in paths if os.path.isfile(path)]
+    if not paths:
+        return None
+
+    trained = datetime.fromtimestamp(max(os.path.getmtime(path)
+                                         for _, path in paths))
+    version = trained.strftime('%Y-%m-%dT%H%M%S')
+    version_dir = os.path.join(root, version)
+    os.makedirs(version_dir)
+    drug_files = list()
+    for drug, path in paths:
+        fname = os.path.basename(path)
+        try:
+            os.link(path, os.path.join(version_dir, fname))
+        except OSError:
+            shutil.copy2(path, os.path.join(version_dir, fname))
+        drug_files.append((drug, fname))
+    write_manifest(version_dir, drug_files, trained.strftime('%Y-%m-%d'))
+    return version
+
+
+def complete_versions(root):
+    """
+    Returns the names of the complete versions under `root`, oldest first.
+    """
+    if not os.path.isdir(root):
+        return list()
+    return sorted(v for v in os.listdir(root)
+                  if os.path.isfile(os.path.join(root, v, MANIFEST)))
+
+
+def latest_version(root):
+    """
+    Returns the name of the greatest complete version under `root`, or None.
+    """
+    versions = complete_versions(root)
+    return versions[-1] if versions else None
+
+
+class ModelSet(object):
+    """
+    An immutable set of loaded models for one version.
+
+    Attributes:
+    ===========
+    - version: (str) the version directory name.
+    - drugs: (list) drug names, in manifest order.
+    - models: (list) the models, aligned with `drugs`.
+    - outputs: (list) the output column of each drug's model, or None for
+               single-drug models.
+    - fast_trees: (list) the number of trees of each drug's model to use in
+                  fast mode, or None to use all of them.
+    - manifest: (dict) the parsed manifest.
+    - encoding: (dict) the input encoding the models expect.
+    """
+    def __init__(self, version, drugs, models, outputs, fast_trees,
+                 manifest):
+        self.version = version
+        self.drugs = drugs
+        self.models = models
+        self.outputs = outputs
+        self.fast_trees = fast_trees
+        self.manifest = manifest
+        self.encoding = manifest.get('encoding', dict(rep='mw'))
+
+
+def load_version(root, version, loader):
+    """
+    Loads and verifies every model listed in a version's manifest.
+
+    Raises a ValueError if any model file does not match its manifest hash.
+    """
+    version_dir = os.path.join(root, version)
+    with open(os.path.join(version_dir, MANIFEST)) as f:
+        manifest = json.load(f)
+
+    drugs = list()
+    models = list()
+    outputs = list()
+    fast_trees = list()
+    loaded = dict()
+    for entry in manifest['models']:
+        path = os.path.join(version_dir, entry['file'])
+        if path not in loaded:
+            if file_hash(path) != entry['sha256']:
+                raise ValueError('hash mismatch for {0}'.format(path))
+            print('loading model for drug {0} ({1})'.format(entry['drug'],
+                                                            version))
+            loaded[path] = loader(path)
+        drugs.append(entry['drug'])
+        models.append(loaded[path])
+        outputs.append(entry.get('output'))
+        fast_trees.append(entry.get('fast_trees'))
+
+    return ModelSet(version, drugs, models, outputs, fast_trees, manifest)
+
+
+def joblib_loader(path):
+    import joblib
+
+    return joblib.load(path)
+
+
+class ModelStore(object):
+    """
+    Serves the latest complete model version under `root` and swaps in new
+    versions as they appear.
+
+    Parameters:
+    ===========
+    - root: (str) the model root directory.
+    - loader: (function) loads a single model file; defaults to joblib.
+    - interval: (float) seconds between polls of the watcher thread.
+    """
+    def __init__(self, root, loader=joblib_loader, interval=30):
+        self.root = root
+        self.loader = loader
+        self.interval = interval
+        self.current = None
+        # Versions that failed to load -> the mtime of their manifest then.
+        self.failed = dict()
+        self._load_lock = Lock()
+        self._stop = Event()
+        self._watcher = None
+
+    def get(self):
+        """
+        Returns the current ModelSet, loading the latest version on first use.
+        Callers should hold on to the returned object for the duration of a
+        request rather than reading `current` repeatedly.
+        """
+        current = self.current
+        if current is None:
+            self.check()
+            current = self.current
+        if current is None and self.failed:
+            raise IOError('no model version under {0} could be loaded '
+                          '(failed: {1})'.format(self.root,
+                                                 sorted(self.failed)))
+        if current is None:
+            raise IOError('no model versions found under {0}; models in the '
+                          'old base/<drug>/<drug>.pkl layout can be '
+                          'migrated with scripts/migrate_models.py'
+                          .format(self.root))
+        return current
+
+    def _manifest_mtime(self, version):
+        return os.path.getmtime(os.path.join(self.root, version, MANIFEST))
+
+    def check(self):
+        """
+        Loads and swaps in the newest version that is newer than the one
+        being served and loads. Versions that fail to load are reported,
+        remembered and skipped from then on. Returns True if a swap
+        happened.
+        """
+        with self._load_lock:
+            current = self.current
+            for version in reversed(complete_versions(self.root)):
+                if current is not None and version <= current.version:
+                    return False
+                try:
+                    mtime = self._manifest_mtime(version)
+                except OSError:
+                    # Removed since it was listed.
+                    continue
+                if self.failed.get(version) == mtime:
+                    continue
+                try:
+                    model_set = load_version(self.root, version,
+                                             self.loader)
+                except Exception:
+                    traceback.print_exc()
+                    self.failed[version] = mtime
+                    continue
+                self.failed.pop(version, None)
+                # The swap itself is a single reference assignment.
+                self.current = model_set
+                return True
+            return False
+
+    def _watch(self):
+        # Load the current version straight away, off the request path.
+        while True:
+            try:
+                self.check()
+            except Exception:
+                # Keep serving the old version on unexpected errors.
+                traceback.print_exc()
+            if self._stop.wait(self.interval):
+                break
+
+    def start_watcher(self):
+        """
+        Starts a daemon thread that loads the latest version, then polls for
+        new versions.
+        """
+        if self._watcher is None:
+            self._stop.clear()
+            self._watcher = Thread(target=self._watch, name='model-watcher')
+            self._watcher.daemon = True
+            self._watcher.start()
+
+    def stop_watcher(self):
+        if self._watcher is not None:
+            self._stop.set()
+            self._watcher.join()
+            self._watcher = None
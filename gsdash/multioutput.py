@@ -0,0 +1,55 @@
+"""
+Training helpers for a single multi-output forest per protein.
+
+Instead of one forest per drug, one forest is fit on all of a protein's drugs
+at once, so that scoring a sequence takes one traversal per tree for every
+drug together.
+
+Not every sequence has been phenotyped against every drug (see
+`hiv-protease-drug-data.csv`), and scikit-learn's forests do not accept
+missing targets. Missing targets are therefore imputed: they start at the
+drug's mean, and are then replaced with the forest's out-of-bag predictions
+for a number of rounds before the final fit.
+"""
+from sklearn.ensemble import RandomForestRegressor
+
+import numpy as np
+
+
+def fit_multioutput_forest(X, Y, n_rounds=3, **kwargs):
+    """
+    Fits a RandomForestRegressor on all drug columns of Y at once.
+
+    Parameters:
+    ===========
+    - X: (np.array) the n_samples x n_features feature matrix.
+    - Y: (np.array) the n_samples x n_drugs target matrix, with NaN where a
+         sample has not been phenotyped against a drug.
+    - n_rounds: (int) number of out-of-bag imputation rounds before the final
+                fit. 0 imputes missing targets with the drug mean only.
+    - kwargs: passed on to RandomForestRegressor.
+
+    Returns:
+    ========
+    - mdl: (RandomForestRegressor) the fitted multi-output forest.
+    - Y_imputed: (np.array) the targets that the final forest was fit on.
+    """
+    Y = np.asarray(Y, dtype=float)
+    assert Y.ndim == 2, 'Y must be an n_samples x n_drugs array.'
+    missing = np.isnan(Y)
+    assert not missing.all(axis=0).any(), 'every drug needs some targets.'
+
+    Y_imputed = np.where(missing, np.nanmean(Y, axis=0), Y)
+
+    for i in range(n_rounds):
+        mdl = RandomForestRegressor(oob_score=True, bootstrap=True, **kwargs)
+        mdl.fit(X, Y_imputed)
+        oob = mdl.oob_prediction_.reshape(Y.shape)
+        # Samples that were in-bag for every tree have no OOB prediction.
+        fill = missing & ~np.isnan(oob)
+        Y_imputed[fill] = oob[fill]
+
+    mdl = RandomForestRegressor(**kwargs)
+    mdl.fit(X, Y_imputed)
+
+    return mdl, Y_imputed
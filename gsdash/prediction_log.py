@@ -0,0 +1,215 @@
+"""
+An indexed, on-disk log of every prediction made by the predictor, together
+with incrementally maintained surveillance aggregates.
+
+Each prediction is appended to a `predictions` table indexed on drug, time and
+sequence hash. The sequence text itself is stored once per distinct sequence,
+in a `sequences` table keyed by the same hash. Sequences are normalised
+(stripped and upper-cased) before they are hashed or stored. At the same
+time, per-drug aggregates are updated for the time bucket that the
+prediction falls in:
+
+- `hist`: counts of predictions in each log10(DR) histogram bin.
+- `summary`: count, sum, sum of squares and number above the cutoff.
+
+Rolling-window dashboard queries only ever touch the aggregate rows of the
+buckets inside the window, so they do not scale with the total number of
+predictions logged.
+"""
+from hashlib import sha1
+from threading import Lock
+
+import numpy as np
+import sqlite3
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    drug TEXT NOT NULL,
+    seq_hash TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_predictions_drug_ts ON predictions (drug, ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_ts ON predictions (ts);
+CREATE INDEX IF NOT EXISTS idx_predictions_seq_hash
+    ON predictions (seq_hash);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    seq_hash TEXT PRIMARY KEY,
+    sequence TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS hist (
+    drug TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    bin INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (drug, bucket, bin)
+);
+CREATE TABLE IF NOT EXISTS summary (
+    drug TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    n_above INTEGER NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    total_sq REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (drug, bucket)
+);
+CREATE INDEX IF NOT EXISTS idx_summary_bucket ON summary (bucket);
+"""
+
+
+def normalize_sequence(sequence):
+    """
+    Returns the form in which a sequence is hashed and stored: without
+    surrounding whitespace, and upper-cased.
+    """
+    return sequence.strip().upper()
+
+
+def sequence_hash(sequence):
+    """
+    Returns the hex digest used to index a sequence in the log.
+    """
+    return sha1(normalize_sequence(sequence).encode('ascii')).hexdigest()
+
+
+class PredictionLog(object):
+    """
+    A sqlite-backed prediction log with rolling-window aggregates.
+
+    Parameters:
+    ===========
+    - path: (str) path to the sqlite database; ':memory:' for a throwaway log.
+    - cutoff: (float) the log10(DR) value above which a prediction counts as
+              resistant.
+    - bins: (np.array) histogram bin edges over log10(DR). Values outside the
+            edges are counted in the first or last bin.
+    - bucket_seconds: (int) time granularity of the aggregates. Rolling
+                      windows are rounded to whole buckets.
+    """
+    def __init__(self, path, cutoff=1.0, bins=np.linspace(-1, 3, 41),
+                 bucket_seconds=3600):
+        self.path = path
+        self.cutoff = cutoff
+        self.bins = np.asarray(bins, dtype=float)
+        self.bucket_seconds = bucket_seconds
+        self._lock = Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _bin(self, value):
+        i = np.searchsorted(self.bins, value, side='right') - 1
+        return int(np.clip(i, 0, len(self.bins) - 2))
+
+    def record(self, sequence, preds, ts=None):
+        """
+        Logs one prediction per drug for a sequence and updates the
+        aggregates in the same transaction.
+
+        Parameters:
+        ===========
+        - sequence: (str) the amino acid string that was scored; it is
+                    stored normalised (see `normalize_sequence`).
+        - preds: (dict) mapping of drug name to predicted log10(DR).
+        - ts: (float) unix timestamp; defaults to now.
+        """
+        if ts is None:
+            ts = time.time()
+        bucket = int(ts // self.bucket_seconds)
+        sequence = normalize_sequence(sequence)
+        seq_hash = sequence_hash(sequence)
+
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR IGNORE INTO sequences (seq_hash, sequence) '
+                'VALUES (?, ?)', (seq_hash, sequence))
+            for drug, value in preds.items():
+                value = float(value)
+                above = int(value > self.cutoff)
+                b = self._bin(value)
+                self._conn.execute(
+                    'INSERT INTO predictions (ts, drug, seq_hash, value) '
+                    'VALUES (?, ?, ?, ?)', (ts, drug, seq_hash, value))
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO hist (drug, bucket, bin) '
+                    'VALUES (?, ?, ?)', (drug, bucket, b))
+                self._conn.execute(
+                    'UPDATE hist SET n = n + 1 '
+                    'WHERE drug = ? AND bucket = ? AND bin = ?',
+                    (drug, bucket, b))
+                self._conn.execute(
+                    'INSERT OR IGNORE INTO summary (drug, bucket) '
+                    'VALUES (?, ?)', (drug, bucket))
+                self._conn.execute(
+                    'UPDATE summary SET n = n + 1, n_above = n_above + ?, '
+                    'total = total + ?, total_sq = total_sq + ? '
+                    'WHERE drug = ? AND bucket = ?',
+                    (above, value, value ** 2, drug, bucket))
+
+    def _bucket_range(self, window, now):
+        if now is None:
+            now = time.time()
+        end = int(now // self.bucket_seconds)
+        start = end - int(np.ceil(window / self.bucket_seconds)) + 1
+        return start, end
+
+    def distribution(self, drug, window, now=None):
+        """
+        Returns the histogram of predicted log10(DR) for a drug over the last
+        `window` seconds, as (bin_edges, counts).
+        """
+        start, end = self._bucket_range(window, now)
+        counts = np.zeros(len(self.bins) - 1, dtype=int)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT bin, SUM(n) FROM hist WHERE drug = ? AND bucket '
+                'BETWEEN ? AND ? GROUP BY bin', (drug, start, end)).fetchall()
+        for b, n in rows:
+            counts[b] = n
+        return self.bins, counts
+
+    def summary(self, window, now=None):
+        """
+        Returns per-drug aggregates over the last `window` seconds: the number
+        of predictions, their mean and standard deviation, and the fraction
+        above the resistance cutoff.
+        """
+        start, end = self._bucket_range(window, now)
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT drug, SUM(n), SUM(n_above), SUM(total), '
+                'SUM(total_sq) FROM summary WHERE bucket BETWEEN ? AND ? '
+                'GROUP BY drug', (start, end)).fetchall()
+
+        summaries = dict()
+        for drug, n, n_above, total, total_sq in rows:
+            mean = total / n
+            var = max(total_sq / n - mean ** 2, 0)
+            summaries[drug] = dict(n=n,
+                                   mean=mean,
+                                   std=np.sqrt(var),
+                                   fraction_above=n_above / n)
+        return summaries
+
+    def fraction_above(self, drug, window, now=None):
+        """
+        Returns the fraction of predictions for a drug over the last `window`
+        seconds that are above the cutoff, or NaN if there were none.
+        """
+        s = self.summary(window, now).get(drug)
+        return s['fraction_above'] if s else np.nan
+
+    def history(self, sequence):
+        """
+        Returns all logged (ts, drug, log10(DR)) records for a sequence.
+        """
+        with self._lock:
+            return self._conn.execute(
+                'SELECT ts, drug, value FROM predictions WHERE seq_hash = ? '
+                'ORDER BY ts', (sequence_hash(sequence),)).fetchall()
+
+    def close(self):
+        self._conn.close()
@@ -1,21 +1,27 @@
 import numpy as np
-from sklearn.externals import joblib
 
-def load_model(drug):
-    print('loading model for drug {0}'.format(drug))
-    mdl = joblib.load("../models/base/{drug}/{drug}.pkl".format(drug=drug))
-    return mdl, drug
 
-
-def pred_range(model, datum):
+def pred_range(model, datum, n_trees=None):
     """
-    Returns the full range of predictions for a given ensemble model.
+    Returns the full range of predictions for a given ensemble model, or of
+    its first `n_trees` trees (see gsdash.tree_subset).
     """
-    preds = np.zeros(len(model.estimators_))
-    for i, est in enumerate(model.estimators_):
-        preds[i] = est.predict(datum).reshape(1, -1)[0]
+    estimators = model.estimators_[:n_trees]
+    preds = np.zeros(len(estimators))
+    for i, est in enumerate(estimators):
+        preds[i] = est.predict(datum)[0]
     return preds
 
+
+def multioutput_pred_range(model, datum, n_trees=None):
+    """
+    Returns the full range of predictions of a multi-output ensemble model,
+    as an n_trees x n_outputs array. Each tree is traversed once for all
+    outputs.
+    """
+    return np.array([est.predict(datum).reshape(1, -1)[0]
+                     for est in model.estimators_[:n_trees]])
+
 def intervals(data, percentile=95):
     """
     Given a numpy array of data, return the 0th, lower bound, median,
@@ -29,15 +35,36 @@ def intervals(data, percentile=95):
     return np.percentile(data,
                          [0, low, med, upp, 100])
 
-def predictions(drugs, models, seq):
+def predictions(drugs, models, seq, outputs=None, n_trees=None):
+    """
+    Returns the per-tree predictions for every drug, records-style.
+
+    `outputs` gives, for each drug, its column in a multi-output model, or
+    None for a single-drug model. Drugs that share a multi-output model reuse
+    a single pass over its trees.
+
+    `n_trees` gives, for each drug, the number of trees to use (fast mode),
+    or None for all of them.
+    """
+    if outputs is None:
+        outputs = [None] * len(drugs)
+    if n_trees is None:
+        n_trees = [None] * len(drugs)
+    multioutput_ranges = dict()
+
     preds = list()  # we will store the data records-style
     # preds['drug'] = list()
     # preds['log10(DR)'] = list()
     # preds['yerr'] = list()
-    for drug, mdl in zip(drugs, models):
+    for drug, mdl, output, n in zip(drugs, models, outputs, n_trees):
         print(drug)
-        pred = mdl.predict(seq)[0]
-        prange = pred_range(mdl, seq)
+        if output is None:
+            prange = pred_range(mdl, seq, n)
+        else:
+            key = (id(mdl), n)
+            if key not in multioutput_ranges:
+                multioutput_ranges[key] = multioutput_pred_range(mdl, seq, n)
+            prange = multioutput_ranges[key][:, output]
         # zeroth, low, med, upp, hundreth = intervals(prange)
         # preds.append(dict(drug=drug, pred=pred))
         # preds['drug'].append(drug)
@@ -51,3 +78,50 @@ def predictions(drugs, models, seq):
             preds.append(pred)
             print(pred)
     return preds
+
+
+def point_predictions(preds):
+    """
+    Collapses the per-tree records returned by `predictions` into a single
+    log10(DR) per drug (the ensemble mean).
+    """
+    per_drug = dict()
+    for pred in preds:
+        per_drug.setdefault(pred['drug'], list()).append(pred['log10(DR)'])
+    return {drug: np.mean(vals) for drug, vals in per_drug.items()}
+
+
+def batch_predictions(drugs, models, X, outputs=None, n_trees=None,
+                      percentile=95):
+    """
+    Scores a batch of encoded sequences with every drug's model.
+
+    `outputs` and `n_trees` are as for `predictions`. Each tree is run once
+    over the whole batch.
+
+    Returns a dict of drug -> dict with the per-row ensemble `mean` and the
+    `low` and `upp` bounds of the central `percentile` interval of the
+    trees, as arrays.
+    """
+    if outputs is None:
+        outputs = [None] * len(drugs)
+    if n_trees is None:
+        n_trees = [None] * len(drugs)
+    low = (100 - percentile) / 2
+    multioutput_preds = dict()
+
+    preds = dict()
+    for drug, mdl, output, n in zip(drugs, models, outputs, n_trees):
+        if output is None:
+            tree_preds = np.array([est.predict(X)
+                                   for est in mdl.estimators_[:n]])
+        else:
+            key = (id(mdl), n)
+            if key not in multioutput_preds:
+                multioutput_preds[key] = np.array(
+                    [est.predict(X) for est in mdl.estimators_[:n]])
+            tree_preds = multioutput_preds[key][:, :, output]
+        bounds = np.percentile(tree_preds, [low, 100 - low], axis=0)
+        preds[drug] = dict(mean=tree_preds.mean(axis=0), low=bounds[0],
+                           upp=bounds[1])
+    return preds
@@ -0,0 +1,145 @@
+"""
+A compact residue-matrix representation of the HIV drug resistance data.
+
+Sequences are stored as an (n_rows, n_positions) uint8 matrix of residue
+codes rather than as hundreds of Python string columns. The codes are:
+
+- 0: unknown ('.', 'X', or an empty/NA cell)
+- 1-20: the amino acids, in the order of `AMINO_ACIDS`
+- CONSENSUS: '-', i.e. same as consensus (sparse files only)
+- STOP: '*'
+- INSERTION: '#'
+- DELETION: '~'
+- MIXTURE: a cell with more than one letter, e.g. 'IV'
+
+Mixture cells are also reported with their letters, since the code alone
+loses them.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+UNKNOWN = 0
+CONSENSUS = 21
+STOP = 22
+INSERTION = 23
+DELETION = 24
+MIXTURE = 25
+
+ALPHABET = '.' + AMINO_ACIDS + '-*#~+'
+
+# Byte -> residue code lookup table. Lower-case letters map like upper-case.
+LUT = np.full(256, UNKNOWN, dtype=np.uint8)
+for code, letter in enumerate(ALPHABET):
+    LUT[ord(letter)] = code
+    LUT[ord(letter.lower())] = code
+LUT[ord('X')] = LUT[ord('x')] = UNKNOWN
+
+HIVData = namedtuple('HIVData', ['seqids', 'drug_cols', 'feat_cols',
+                                 'drug_values', 'residues', 'mixtures'])
+
+
+def encode(sequence):
+    """
+    Encodes an amino acid string as a uint8 array of residue codes.
+    """
+    return LUT[np.frombuffer(sequence.encode('ascii'), dtype=np.uint8)]
+
+
+def decode(codes):
+    """
+    Decodes an array of residue codes back into a string. Unknown positions
+    are returned as '.' and mixtures as '+' (which `encode` maps back to
+    MIXTURE).
+    """
+    return ''.join(ALPHABET[c] for c in codes)
+
+
+def _to_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+def read_residue_data(path, n_drugs, sep=None):
+    """
+    Reads a sparse (tab-separated) or dense (comma-separated) HIV data file
+    straight into a residue matrix.
+
+    Parameters:
+    ===========
+    - path: (str) path to the data file.
+    - n_drugs: (int) the number of drug columns following the SeqID column.
+    - sep: (str) the column separator; inferred from the header if None.
+
+    Returns:
+    ========
+    - data: (HIVData) with fields
+        - seqids: (list) the SeqID of each row, as strings.
+        - drug_cols, feat_cols: (list) the drug and position column names.
+        - drug_values: (np.array) n_rows x n_drugs float, NaN where missing.
+        - residues: (np.array) n_rows x n_positions uint8 residue codes.
+        - mixtures: (dict) (row, position index) -> upper-cased letters of
+                    every mixture cell.
+    """
+    with open(path) as f:
+        header = f.readline().rstrip('\r\n')
+        if sep is None:
+            sep = '\t' if '\t' in header else ','
+        columns = header.split(sep)
+        lines = f.read().splitlines()
+
+    drug_cols = columns[1:1 + n_drugs]
+    feat_cols = columns[1 + n_drugs:]
+    n_positions = len(feat_cols)
+    lines = [line for line in lines if line]
+
+    seqids = list()
+    drug_values = np.empty((len(lines), n_drugs))
+    rows = list()
+    mixtures = dict()
+
+    for row, line in enumerate(lines):
+        cells = line.split(sep)
+        assert len(cells) == len(columns), \
+            'row {0} has {1} columns, expected {2}'.format(row, len(cells),
+                                                           len(columns))
+        seqids.append(cells[0])
+        drug_values[row] = [_to_float(c) for c in cells[1:1 + n_drugs]]
+
+        feats = cells[1 + n_drugs:]
+        joined = ''.join(feats)
+        if len(joined) != n_positions or '' in feats:
+            # Slow path: the row has empty or mixture cells.
+            for pos, cell in enumerate(feats):
+                if len(cell) > 1 and cell != 'NA':
+                    mixtures[(row, pos)] = cell.upper()
+            joined = ''.join([c if len(c) == 1 else
+                              '.' if c in ('', 'NA') else '+'
+                              for c in feats])
+        rows.append(joined)
+
+    # Encode every row in one pass over a single buffer.
+    residues = LUT[np.frombuffer(''.join(rows).encode('ascii'),
+                                 dtype=np.uint8)]\
+        .reshape(len(lines), n_positions)
+
+    return HIVData(seqids, drug_cols, feat_cols, drug_values, residues,
+                   mixtures)
+
+
+def fill_consensus(residues, consensus):
+    """
+    Returns a copy of a sparse residue matrix with the '-' (same as
+    consensus) cells replaced by the consensus residues.
+
+    Parameters:
+    ===========
+    - residues: (np.array) n_rows x n_positions residue codes.
+    - consensus: (str) the consensus sequence, at least n_positions long.
+    """
+    cons_codes = encode(consensus)[:residues.shape[1]]
+    return np.where(residues == CONSENSUS, cons_codes, residues)\
+        .astype(np.uint8)
@@ -0,0 +1,496 @@
+"""
+A compact, deduplicating store of amino acid sequences.
+
+Sequences are held as the uint8 residue codes of gsdash.residue_matrix,
+concatenated into a single buffer with an offset per sequence, instead of as
+Python strings (or one pandas object cell per residue). Each distinct
+sequence is stored once, with a count of how many times it was added.
+
+- Lookup by sequence is O(1): sequences are hashed with a polynomial hash
+  over their codes, and found through an open-addressing hash table held
+  in a numpy array (no per-sequence Python objects).
+- `codes(i)` and `rows(start, stop)` are zero-copy views into the buffer,
+  ready for the encoders (e.g. gsdash.sparse_encoding).
+- A store is saved as a directory of .npy files, which `load` memory-maps,
+  so a million-sequence store opens instantly and only the rows that are
+  read are paged in. The codes can also be saved 5-bit packed (26 codes fit
+  in 5 bits), which is 5/8 of the size on disk but is unpacked into memory
+  on load.
+
+The store only accepts canonical residues: upper-case amino acids and
+'.', '-', '*', '#' and '~' (see gsdash.residue_matrix.ALPHABET), so that
+every stored sequence decodes back to exactly the string that was added.
+Anything else, including lower case, 'X' and ambiguity codes such as 'B' or
+'Z', raises a ValueError instead of being folded into the unknown code,
+which would merge distinct sequences.
+
+Mixture cells (e.g. 'IV') are stored as the MIXTURE code plus a side table
+of their letters, like `residue_matrix.HIVData.mixtures`, and the letters
+are part of the hash: sequences that differ only in the letters of a
+mixture are stored separately. Mixtures can only be added as codes, with
+their letters (`add_codes`), since a string has no way to spell them; a
+bare '+' is rejected.
+"""
+from .residue_matrix import ALPHABET, MIXTURE, decode
+
+import numpy as np
+import os
+
+# Multiplier of the polynomial hash; all arithmetic wraps around at 2**64.
+HASH_BASE = np.uint64(0x100000001B3)
+
+EMPTY = -1
+
+# Code of the characters the store rejects.
+INVALID = 255
+
+# A strict residue_matrix.LUT: canonical characters only.
+STORE_LUT = np.full(256, INVALID, dtype=np.uint8)
+for code, letter in enumerate(ALPHABET[:MIXTURE]):
+    STORE_LUT[ord(letter)] = code
+
+
+powers = np.cumprod(np.full(128, HASH_BASE, dtype=np.uint64))
+
+
+def _powers(n):
+    """
+    Returns HASH_BASE ** (1..n), wrapping around at 2**64.
+    """
+    global powers
+    if n > len(powers):
+        powers = np.cumprod(np.full(2 * n, HASH_BASE, dtype=np.uint64))
+    return powers[:n]
+
+
+def sequence_hashes(codes, offsets):
+    """
+    Hashes every sequence of a concatenated code buffer at once.
+
+    Parameters:
+    ===========
+    - codes: (np.array) the uint8 codes of all sequences, concatenated.
+    - offsets: (np.array) n_sequences + 1 start offsets into `codes`.
+
+    Returns:
+    ========
+    - hashes: (np.array) n_sequences uint64 hashes.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    hashes = lengths.astype(np.uint64)
+    if len(codes) == 0:
+        return hashes
+
+    starts = offsets[:-1]
+    pos = np.arange(len(codes)) - np.repeat(starts, lengths)
+    # Codes are shifted by 1, so that leading unknowns (code 0) still count.
+    terms = (codes.astype(np.uint64) + np.uint64(1)) * \
+        _powers(lengths.max())[pos]
+    nonempty = lengths > 0
+    hashes[nonempty] += np.add.reduceat(terms, starts[nonempty])
+    return hashes
+
+
+def pack5(codes):
+    """
+    Packs uint8 codes below 32 into 5 bits each: every 8 codes into 5 bytes.
+    """
+    codes = np.asarray(codes, dtype=np.uint64)
+    padded = np.zeros(-(-len(codes) // 8) * 8, dtype=np.uint64)
+    padded[:len(codes)] = codes
+    shifts = np.arange(8, dtype=np.uint64) * np.uint64(5)
+    words = (padded.reshape(-1, 8) << shifts).sum(axis=1, dtype=np.uint64)
+    # Keep the 5 low bytes of each little-endian 64-bit word.
+    return words.astype('<u8').view(np.uint8).reshape(-1, 8)[:, :5].ravel()
+
+
+def unpack5(packed, n_codes):
+    """
+    Unpacks the first `n_codes` codes packed by `pack5`.
+    """
+    words = np.zeros((len(packed) // 5, 8), dtype=np.uint8)
+    words[:, :5] = np.asarray(packed, dtype=np.uint8).reshape(-1, 5)
+    words = words.view('<u8').ravel()
+    shifts = np.arange(8, dtype=np.uint64) * np.uint64(5)
+    codes = (words[:, None] >> shifts) & np.uint64(31)
+    return codes.astype(np.uint8).ravel()[:n_codes]
+
+
+def mixture_mask(letters):
+    """
+    Returns the set of a mixture's letters as a bit mask over residue codes.
+    Raises a ValueError if a letter is not canonical or there are none.
+    """
+    codes = _encode(letters)
+    if len(codes) == 0:
+        raise ValueError('a mixture needs letters')
+    return int(np.bitwise_or.reduce(np.left_shift(1, codes.astype(np.int64))))
+
+
+def mixture_letters(mask):
+    """
+    Returns the letters of a mixture bit mask, in ALPHABET order.
+    """
+    return ''.join(letter for code, letter in enumerate(ALPHABET[:MIXTURE])
+                   if mask >> code & 1)
+
+
+def _encode(text):
+    """
+    Encodes a string of canonical residues, raising a ValueError on any
+    other character.
+    """
+    try:
+        codes = STORE_LUT[np.frombuffer(text.encode('ascii'), dtype=np.uint8)]
+    except UnicodeEncodeError:
+        codes = None
+    if codes is None or (codes == INVALID).any():
+        bad = sorted(set(text) - set(ALPHABET[:MIXTURE]))
+        raise ValueError('non-canonical residues {0}: the store only '
+                         'accepts {1}'.format(bad, ALPHABET[:MIXTURE]))
+    return codes
+
+
+def _encode_all(sequences):
+    """
+    Encodes a list of strings into a concatenated code buffer and offsets.
+    """
+    lengths = np.array([len(s) for s in sequences], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return _encode(''.join(sequences)), offsets
+
+
+def _mixture_table(codes, offsets, mixtures):
+    """
+    Returns the (sequence, position, letters mask) arrays of a batch's
+    mixture cells, sorted by sequence and position. Raises a ValueError
+    unless the MIXTURE cells of `codes` are exactly the cells with letters
+    in `mixtures`.
+    """
+    flat = np.flatnonzero(codes == MIXTURE)
+    rows = np.searchsorted(offsets, flat, side='right') - 1
+    cells = set(zip(rows.tolist(), (flat - offsets[rows]).tolist()))
+    mixtures = mixtures or dict()
+    if cells != set(mixtures):
+        raise ValueError('MIXTURE cells without letters: {0}; letters of '
+                         'other cells: {1}'.format(
+                             sorted(cells - set(mixtures))[:5],
+                             sorted(set(mixtures) - cells)[:5]))
+    keys = sorted(cells)
+    rows = np.array([row for row, _ in keys], dtype=np.int64)
+    positions = np.array([pos for _, pos in keys], dtype=np.int32)
+    masks = np.array([mixture_mask(mixtures[key]) for key in keys],
+                     dtype=np.uint32)
+    return rows, positions, masks
+
+
+class SequenceStore(object):
+    """
+    An append-only, deduplicating store of sequences.
+
+    Attributes:
+    ===========
+    - counts: (np.array) the number of times each stored sequence was
+              added (a view of the first len(store) entries).
+    """
+    def __init__(self, capacity=1024, length=128):
+        self._n = 0
+        self._n_codes = 0
+        self._n_mix = 0
+        self._codes = np.zeros(capacity * length, dtype=np.uint8)
+        self._offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._hashes = np.zeros(capacity, dtype=np.uint64)
+        self._counts = np.zeros(capacity, dtype=np.int64)
+        # The mixture cells of sequence i are entries
+        # _mix_offsets[i]:_mix_offsets[i + 1] of the positions and masks.
+        self._mix_offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self._mix_positions = np.zeros(capacity, dtype=np.int32)
+        self._mix_masks = np.zeros(capacity, dtype=np.uint32)
+        self._table = np.full(1 << max(4, (2 * capacity - 1).bit_length()),
+                              EMPTY, dtype=np.int64)
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, sequence):
+        try:
+            return self.find(sequence) is not None
+        except ValueError:
+            return False
+
+    @property
+    def counts(self):
+        return self._counts[:self._n]
+
+    @property
+    def nbytes(self):
+        """
+        The memory held by the store's arrays, including spare capacity.
+        """
+        return sum(a.nbytes for a in (self._codes, self._offsets,
+                                      self._hashes, self._counts,
+                                      self._mix_offsets, self._mix_positions,
+                                      self._mix_masks, self._table))
+
+    def _probe(self, h, codes, masks):
+        """
+        Returns the table slot holding `codes` with mixture letters `masks`,
+        or the empty slot where they would go.
+        """
+        mask = len(self._table) - 1
+        slot = h & mask
+        while True:
+            i = self._table[slot]
+            if i == EMPTY:
+                return slot
+            # Equal codes have their mixture cells at the same positions, so
+            # only the letters are left to compare.
+            if self._hashes[i] == h and \
+                    self._codes[self._offsets[i]:self._offsets[i + 1]]\
+                    .tobytes() == codes.tobytes() and \
+                    self._mix_masks[self._mix_offsets[i]:
+                                    self._mix_offsets[i + 1]]\
+                    .tobytes() == masks.tobytes():
+                return slot
+            slot = (slot + 1) & mask
+
+    def _grow(self, n_new, n_new_codes, n_new_mix=0):
+        """
+        Makes room for `n_new` more sequences with `n_new_codes` codes and
+        `n_new_mix` mixture cells. Existing views stay valid: they keep the
+        old buffers alive.
+        """
+        # Copy memory-mapped (read-only) arrays of a loaded store.
+        for name in ('_codes', '_offsets', '_hashes', '_counts',
+                     '_mix_offsets', '_mix_positions', '_mix_masks',
+                     '_table'):
+            if not getattr(self, name).flags.writeable:
+                setattr(self, name, np.array(getattr(self, name)))
+        if self._n_codes + n_new_codes > len(self._codes):
+            size = max(2 * len(self._codes), self._n_codes + n_new_codes)
+            codes = np.zeros(size, dtype=np.uint8)
+            codes[:self._n_codes] = self._codes[:self._n_codes]
+            self._codes = codes
+        if self._n_mix + n_new_mix > len(self._mix_masks):
+            size = max(2 * len(self._mix_masks), self._n_mix + n_new_mix)
+            for name in ('_mix_positions', '_mix_masks'):
+                old = getattr(self, name)
+                new = np.zeros(size, dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        if self._n + n_new > len(self._hashes):
+            size = max(2 * len(self._hashes), self._n + n_new)
+            for name in ('_offsets', '_hashes', '_counts', '_mix_offsets'):
+                old = getattr(self, name)
+                new = np.zeros(size + name.endswith('_offsets'),
+                               dtype=old.dtype)
+                new[:len(old)] = old
+                setattr(self, name, new)
+        if 2 * (self._n + n_new) > len(self._table):
+            size = 1 << (2 * (self._n + n_new) - 1).bit_length()
+            self._table = np.full(size, EMPTY, dtype=np.int64)
+            mask = size - 1
+            for i, h in enumerate(self._hashes[:self._n].tolist()):
+                slot = h & mask
+                while self._table[slot] != EMPTY:
+                    slot = (slot + 1) & mask
+                self._table[slot] = i
+
+    def add_codes(self, codes, offsets=None, mixtures=None):
+        """
+        Adds a batch of sequences given as a concatenated code buffer and
+        its n + 1 offsets; or as an n_rows x n_positions residue matrix, with
+        `offsets` None.
+
+        Parameters:
+        ===========
+        - codes, offsets: the sequences, as above.
+        - mixtures: (dict) (sequence in the batch, position) -> letters of
+                    every MIXTURE cell, as in `HIVData.mixtures`. The order
+                    of a cell's letters does not matter.
+
+        Returns:
+        ========
+        - indices: (np.array) the index of each added sequence in the store.
+                   Duplicates, within the batch or of stored sequences,
+                   share an index.
+
+        Raises a ValueError, adding none of the sequences, on out-of-range
+        codes, MIXTURE cells without letters or letters of other cells.
+        """
+        if offsets is None:
+            codes = np.asarray(codes, dtype=np.uint8)
+            offsets = np.arange(len(codes) + 1) * codes.shape[1]
+            codes = codes.ravel()
+        if len(codes) and codes.max() > MIXTURE:
+            raise ValueError('the store only accepts codes up to MIXTURE')
+        offsets = np.asarray(offsets, dtype=np.int64)
+        n = len(offsets) - 1
+        mix_rows, mix_positions, mix_masks = _mixture_table(codes, offsets,
+                                                            mixtures)
+        self._grow(n, len(codes), len(mix_rows))
+
+        hashes = sequence_hashes(codes, offsets)
+        if len(mix_rows):
+            # Each mixture cell also hashes its letters, at its position.
+            np.add.at(hashes, mix_rows, mix_masks.astype(np.uint64) *
+                      _powers(int(mix_positions.max()) + 1)[mix_positions])
+        mix_offsets = np.searchsorted(mix_rows, np.arange(n + 1))
+
+        indices = np.empty(n, dtype=np.int64)
+        for k, h in enumerate(hashes.tolist()):
+            seq = codes[offsets[k]:offsets[k + 1]]
+            masks = mix_masks[mix_offsets[k]:mix_offsets[k + 1]]
+            slot = self._probe(h, seq, masks)
+            i = self._table[slot]
+            if i == EMPTY:
+                i = self._n
+                start = self._n_codes
+                self._codes[start:start + len(seq)] = seq
+                self._n_codes += len(seq)
+                self._offsets[i + 1] = self._n_codes
+                start = self._n_mix
+                self._mix_positions[start:start + len(masks)] = \
+                    mix_positions[mix_offsets[k]:mix_offsets[k + 1]]
+                self._mix_masks[start:start + len(masks)] = masks
+                self._n_mix += len(masks)
+                self._mix_offsets[i + 1] = self._n_mix
+                self._hashes[i] = h
+                self._table[slot] = i
+                self._n += 1
+            self._counts[i] += 1
+            indices[k] = i
+        return indices
+
+    def add_many(self, sequences):
+        """
+        Adds a list of sequence strings; see `add_codes`. Raises a
+        ValueError, adding none of them, if any has a non-canonical residue.
+        """
+        return self.add_codes(*_encode_all(sequences))
+
+    def add(self, sequence):
+        """
+        Adds one sequence string and returns its index in the store.
+        """
+        return int(self.add_many([sequence])[0])
+
+    def find(self, sequence):
+        """
+        Returns the index of a sequence string in the store, or None. Raises
+        a ValueError if it has a non-canonical residue.
+        """
+        codes = _encode(sequence)
+        # The single-sequence case of `sequence_hashes`.
+        h = (int(((codes.astype(np.uint64) + np.uint64(1)) *
+                  _powers(len(codes))).sum(dtype=np.uint64)) +
+             len(codes)) % (1 << 64)
+        i = self._table[self._probe(h, codes, np.zeros(0, dtype=np.uint32))]
+        return None if i == EMPTY else int(i)
+
+    def codes(self, i):
+        """
+        Returns a read-only view of the codes of sequence `i`.
+        """
+        view = self._codes[self._offsets[i]:self._offsets[i + 1]]
+        view.flags.writeable = False
+        return view
+
+    def sequence(self, i):
+        """
+        Returns sequence `i` as a string, with its mixture cells as '+'.
+        """
+        return decode(self.codes(i))
+
+    def mixtures(self, i):
+        """
+        Returns the mixture cells of sequence `i`, as position -> letters
+        (in ALPHABET order).
+        """
+        start, stop = self._mix_offsets[i], self._mix_offsets[i + 1]
+        return {int(pos): mixture_letters(int(mask)) for pos, mask in
+                zip(self._mix_positions[start:stop],
+                    self._mix_masks[start:stop])}
+
+    def rows(self, start=0, stop=None):
+        """
+        Returns sequences start..stop as a read-only n x length residue
+        matrix view, without copying. Raises a ValueError if they are not
+        all the same length.
+        """
+        stop = self._n if stop is None else min(stop, self._n)
+        offsets = self._offsets[start:stop + 1]
+        lengths = np.diff(offsets)
+        if len(lengths) and (lengths != lengths[0]).any():
+            raise ValueError('sequences {0}..{1} differ in length'.format(
+                start, stop))
+        length = lengths[0] if len(lengths) else 0
+        view = self._codes[offsets[0]:offsets[-1]]\
+            .reshape(len(lengths), length)
+        view.flags.writeable = False
+        return view
+
+    def row_mixtures(self, start=0, stop=None):
+        """
+        Returns the mixture cells of `rows(start, stop)` as (row, position)
+        -> letters, the format of `HIVData.mixtures` that the encoders take.
+        """
+        stop = self._n if stop is None else min(stop, self._n)
+        return {(i - start, pos): letters for i in range(start, stop)
+                for pos, letters in self.mixtures(i).items()}
+
+    def save(self, path, packed=False):
+        """
+        Saves the store to the directory `path` (created if needed), with the
+        codes 5-bit packed if `packed`.
+        """
+        if not os.path.exists(path):
+            os.makedirs(path)
+        codes = self._codes[:self._n_codes]
+        if packed:
+            np.save(os.path.join(path, 'codes.p5.npy'), pack5(codes))
+        else:
+            np.save(os.path.join(path, 'codes.npy'), codes)
+        np.save(os.path.join(path, 'offsets.npy'),
+                self._offsets[:self._n + 1])
+        np.save(os.path.join(path, 'hashes.npy'), self._hashes[:self._n])
+        np.save(os.path.join(path, 'counts.npy'), self._counts[:self._n])
+        np.save(os.path.join(path, 'mix_offsets.npy'),
+                self._mix_offsets[:self._n + 1])
+        np.save(os.path.join(path, 'mix_positions.npy'),
+                self._mix_positions[:self._n_mix])
+        np.save(os.path.join(path, 'mix_masks.npy'),
+                self._mix_masks[:self._n_mix])
+        np.save(os.path.join(path, 'table.npy'), self._table)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a store saved by `save`, memory-mapping its arrays read-only if
+        `mmap` (packed codes are always unpacked into memory). The loaded
+        store can still be added to: its arrays are copied into memory on
+        the first addition that needs more room.
+        """
+        mode = 'r' if mmap else None
+
+        def load_array(name):
+            return np.load(os.path.join(path, name), mmap_mode=mode)
+
+        store = cls.__new__(cls)
+        store._offsets = load_array('offsets.npy')
+        store._hashes = load_array('hashes.npy')
+        store._counts = load_array('counts.npy')
+        store._mix_offsets = load_array('mix_offsets.npy')
+        store._mix_positions = load_array('mix_positions.npy')
+        store._mix_masks = load_array('mix_masks.npy')
+        store._table = load_array('table.npy')
+        store._n = len(store._hashes)
+        store._n_codes = int(store._offsets[-1])
+        store._n_mix = int(store._mix_offsets[-1])
+        if os.path.exists(os.path.join(path, 'codes.p5.npy')):
+            store._codes = unpack5(np.load(os.path.join(path, 'codes.p5.npy')),
+                                   store._n_codes)
+        else:
+            store._codes = load_array('codes.npy')
+        return store
@@ -1,12 +1,12 @@
 """
 Functions that transform a sequence into its numerical representation.
+
+Only numpy is imported at module load; scipy is imported inside the functions
+that need it so that importing this module stays cheap for the predictor.
 """
-from Bio import SeqIO
 from .molecular_weight import molecular_weights
 from .isoelectric_point import isoelectric_points
-from scipy.interpolate import interp1d
 
-import pandas as pd
 import numpy as np
 
 reflengths = dict()
@@ -33,11 +33,7 @@ def to_numeric_rep(sequence, rep='mw'):
     if rep == 'pKa':
         numeric_dict = isoelectric_points
 
-    df = pd.DataFrame(np.array([i for i in sequence]))\
-        .T\
-        .replace(numeric_dict.keys(), numeric_dict.values())
-
-    return df.ix[0].values
+    return np.array([numeric_dict[letter] for letter in sequence])
 
 
 def standardize_sequence(rep, protein='protease'):
@@ -54,6 +50,8 @@ def standardize_sequence(rep, protein='protease'):
     assert protein in reflengths.keys(), 'protein must be one of {0}'.format(
         reflengths.keys())
 
+    from scipy.interpolate import interp1d
+
     interpolator = interp1d(np.arange(rep.size), rep, fill_value="extrapolate")
     ref_size = reflengths[protein]
     interp_arr = interpolator(np.linspace(0, ref_size, ref_size))
@@ -0,0 +1,110 @@
+"""
+Sparse encodings of residue matrices (see gsdash.residue_matrix).
+
+Unlike the scalar molecular weight / pKa representations, these keep residue
+identity. The scipy.sparse CSR matrices are built directly from the uint8
+residue codes, without a dense one-hot intermediate, so RT-scale inputs
+(240 positions x 26 codes) stay small. scikit-learn's tree ensembles accept
+them for both fitting and prediction.
+"""
+from scipy import sparse
+from .residue_matrix import AMINO_ACIDS, ALPHABET, UNKNOWN
+
+import numpy as np
+
+N_CODES = len(ALPHABET)
+
+
+def onehot_encode(residues, mixtures=None, dtype=np.float32):
+    """
+    One-hot encodes a residue matrix.
+
+    Column `pos * N_CODES + code` is 1 where position `pos` holds residue
+    `code`. Unknown cells have no non-zero entry.
+
+    Parameters:
+    ===========
+    - residues: (np.array) n_rows x n_positions uint8 residue codes.
+    - mixtures: (dict) optional (row, position) -> letters, as returned by
+                `read_residue_data`. Mixture cells are then spread over
+                their letters with equal weights, instead of getting the
+                MIXTURE column.
+    - dtype: the dtype of the matrix values. float32 is what scikit-learn's
+             trees use internally, which avoids a conversion copy.
+
+    Returns:
+    ========
+    - X: (scipy.sparse.csr_matrix) n_rows x (n_positions * N_CODES).
+    """
+    residues = np.asarray(residues, dtype=np.uint8)
+    n_rows, n_positions = residues.shape
+    n_cols = n_positions * N_CODES
+
+    mask = residues != UNKNOWN
+    indices = (np.arange(n_positions) * N_CODES + residues)[mask]
+    indptr = np.concatenate([[0], np.cumsum(mask.sum(axis=1))])
+    X = sparse.csr_matrix((np.ones(len(indices), dtype=dtype),
+                           indices.astype(np.int32), indptr),
+                          shape=(n_rows, n_cols))
+
+    if mixtures:
+        rows, cols, vals = list(), list(), list()
+        for (row, pos), letters in mixtures.items():
+            letters = [a for a in letters if a in AMINO_ACIDS]
+            if not letters:
+                continue
+            # Remove the MIXTURE entry, add the fractional letters.
+            rows.append(row)
+            cols.append(pos * N_CODES + int(residues[row, pos]))
+            vals.append(-1.)
+            for letter in letters:
+                rows.append(row)
+                cols.append(pos * N_CODES + ALPHABET.index(letter))
+                vals.append(1. / len(letters))
+        X = X + sparse.csr_matrix((np.array(vals, dtype=dtype),
+                                   (rows, cols)), shape=(n_rows, n_cols))
+        X.eliminate_zeros()
+
+    return X
+
+
+def kmer_encode(residues, k=2, dtype=np.float32):
+    """
+    Counts the amino acid k-mers in each row of a residue matrix,
+    independently of their position. Windows that contain anything other
+    than an amino acid are skipped.
+
+    Returns:
+    ========
+    - X: (scipy.sparse.csr_matrix) n_rows x 20**k k-mer counts, with k-mers
+         indexed in lexicographic order of `AMINO_ACIDS`.
+    """
+    residues = np.asarray(residues, dtype=np.uint8)
+    n_rows, n_positions = residues.shape
+    n_windows = n_positions - k + 1
+
+    # Amino acid codes are 1-20; shift them to 0-19 digits in base 20.
+    digits = residues.astype(np.int64) - 1
+    is_aa = (digits >= 0) & (digits < len(AMINO_ACIDS))
+    kmer = np.zeros((n_rows, n_windows), dtype=np.int64)
+    valid = np.ones((n_rows, n_windows), dtype=bool)
+    for i in range(k):
+        kmer = kmer * len(AMINO_ACIDS) + digits[:, i:i + n_windows]
+        valid &= is_aa[:, i:i + n_windows]
+
+    rows = np.repeat(np.arange(n_rows), n_windows).reshape(n_rows, n_windows)
+    # Duplicate (row, k-mer) entries are summed into counts.
+    return sparse.csr_matrix((np.ones(valid.sum(), dtype=dtype),
+                              (rows[valid], kmer[valid])),
+                             shape=(n_rows, len(AMINO_ACIDS) ** k))
+
+
+def sparse_encode(residues, k=None, mixtures=None):
+    """
+    The one-hot encoding of a residue matrix, with the k-mer counts appended
+    as extra columns if `k` is given.
+    """
+    X = onehot_encode(residues, mixtures)
+    if k:
+        X = sparse.hstack([X, kmer_encode(residues, k)], format='csr')
+    return X
@@ -0,0 +1,163 @@
+"""
+Structure-aware features from the HIV protease structure
+(data/hiv-protease.pdb).
+
+The structure is parsed once into a residue contact graph: two positions are
+in contact if any of their heavy atoms are within `cutoff` angstroms, found
+with a KD-tree. The protease is a homodimer, so contacts across the two
+chains count too (position i of one chain touching position j of the other
+links positions i and j). The graph is kept as a sparse adjacency matrix and
+cached.
+
+Neighbourhood-averaged features are then computed for a whole batch of
+sequences as a single sparse-matrix x feature-matrix product, with no
+per-sequence geometry work.
+"""
+from .molecular_weight import molecular_weights
+from .residue_matrix import AMINO_ACIDS, ALPHABET
+
+import numpy as np
+import os
+
+CUTOFF = 4.5
+
+contact_graphs = dict()
+
+
+def read_pdb_atoms(path):
+    """
+    Reads the heavy atoms of the ATOM records of a PDB file.
+
+    Returns:
+    ========
+    - chains: (np.array) the chain identifier of each atom.
+    - residues: (np.array) the residue sequence number of each atom.
+    - coords: (np.array) n_atoms x 3 coordinates.
+    """
+    chains, residues, coords = list(), list(), list()
+    with open(path) as f:
+        for line in f:
+            if not line.startswith('ATOM'):
+                continue
+            element = line[76:78].strip() or line[12:16].strip()[0]
+            if element == 'H':
+                continue
+            chains.append(line[21])
+            residues.append(int(line[22:26]))
+            coords.append((float(line[30:38]), float(line[38:46]),
+                           float(line[46:54])))
+    return np.array(chains), np.array(residues), np.array(coords)
+
+
+def contact_graph(path, cutoff=CUTOFF):
+    """
+    Builds the residue contact graph of a structure.
+
+    Returns:
+    ========
+    - adjacency: (scipy.sparse.csr_matrix) n_positions x n_positions, 1 where
+                 two positions are in contact. Positions are the residue
+                 sequence numbers minus 1; the diagonal is only set when a
+                 position touches itself across chains.
+    """
+    from scipy import sparse
+    from scipy.spatial import cKDTree
+
+    chains, residues, coords = read_pdb_atoms(path)
+    pairs = cKDTree(coords).query_pairs(cutoff, output_type='ndarray')
+    i, j = pairs[:, 0], pairs[:, 1]
+    # Contacts within a residue are not contacts.
+    keep = (residues[i] != residues[j]) | (chains[i] != chains[j])
+    i, j = residues[i[keep]] - 1, residues[j[keep]] - 1
+
+    n_positions = residues.max()
+    adjacency = sparse.csr_matrix((np.ones(2 * len(i)),
+                                   (np.concatenate([i, j]),
+                                    np.concatenate([j, i]))),
+                                  shape=(n_positions, n_positions))
+    # Duplicate atom pairs are summed; reduce to 0/1.
+    adjacency.data[:] = 1
+    return adjacency
+
+
+def load_contact_graph(path, cutoff=CUTOFF, cache_path=None):
+    """
+    Returns the contact graph of a structure, built on first use and then
+    cached in memory and, if `cache_path` is given, on disk as a .npz. The
+    .npz records the cutoff it was built with; a file built with another
+    cutoff is rebuilt and overwritten.
+    """
+    from scipy import sparse
+
+    key = (os.path.abspath(path), cutoff)
+    if key not in contact_graphs:
+        adjacency = None
+        if cache_path is not None and os.path.exists(cache_path):
+            with np.load(cache_path) as f:
+                if 'cutoff' in f and f['cutoff'] == cutoff:
+                    adjacency = sparse.csr_matrix(
+                        (f['data'], f['indices'], f['indptr']),
+                        shape=tuple(f['shape']))
+        if adjacency is None:
+            adjacency = contact_graph(path, cutoff)
+            if cache_path is not None:
+                np.savez(cache_path, cutoff=cutoff, data=adjacency.data,
+                         indices=adjacency.indices, indptr=adjacency.indptr,
+                         shape=adjacency.shape)
+        contact_graphs[key] = adjacency
+    return contact_graphs[key]
+
+
+def neighbourhood_operator(adjacency, include_self=True):
+    """
+    Returns the sparse operator W such that `W.dot(values)` averages each
+    position's values over its contacts (and itself, if `include_self`).
+    """
+    from scipy import sparse
+
+    W = adjacency.astype(float).tolil()
+    W.setdiag(1 if include_self else 0)
+    return sparse.csr_matrix(W)
+
+
+def value_table(values=molecular_weights):
+    """
+    Returns a residue code -> value lookup array for a dict of amino acid
+    values, with NaN for every non amino acid code.
+    """
+    table = np.full(len(ALPHABET), np.nan)
+    for code, letter in enumerate(AMINO_ACIDS, start=1):
+        table[code] = values[letter]
+    return table
+
+
+def neighbourhood_features(residues, operator, values=molecular_weights):
+    """
+    Computes neighbourhood-averaged physicochemical features for a batch of
+    sequences.
+
+    Positions without a value (unknown, mixture, stop, ...) are left out of
+    their neighbours' averages. A position none of whose neighbours has a
+    value gets NaN.
+
+    Parameters:
+    ===========
+    - residues: (np.array) n_rows x n_positions residue codes, with the
+                consensus filled in (see residue_matrix.fill_consensus).
+    - operator: (scipy.sparse matrix) from `neighbourhood_operator`.
+    - values: (dict) amino acid -> value, e.g. molecular_weights or
+              isoelectric_points.
+
+    Returns:
+    ========
+    - features: (np.array) n_rows x n_positions neighbourhood averages.
+    """
+    X = value_table(values)[residues]
+    known = ~np.isnan(X)
+    n_rows = len(X)
+
+    # Sums and counts of the known neighbour values, in one product.
+    stacked = np.vstack([np.where(known, X, 0), known]).T
+    sums = operator.dot(stacked).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums[:n_rows] / sums[n_rows:]
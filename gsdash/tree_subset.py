@@ -0,0 +1,108 @@
+"""
+Selects a reduced subset of a forest's trees for a latency-budgeted "fast
+mode".
+
+The trees of a random forest are independent draws, so the first K trees are
+a random subset of the forest. `select_n_trees` finds the smallest K for which
+the ensemble mean and the central percentile intervals of the first K trees
+stay within a tolerance of the full forest on held-out inputs.
+
+K must be chosen on many inputs that the forest was not trained on: on a few
+dozen, the deviations are too noisy to carry over to new sequences, so
+`select_n_trees` warns below MIN_INPUTS of them. To leave room for the
+remaining difference, K is selected to meet MARGIN times the tolerance,
+and `check_n_trees` can verify a selection on a separate held-out set.
+
+Only the lower bound, median and upper bound of `predutils.intervals` are
+compared. The 0th and 100th percentiles are the extremes of the trees, which
+necessarily widen as trees are added, so they are not expected to converge.
+"""
+import numpy as np
+import warnings
+
+# The fraction of the tolerance that a selection must meet.
+MARGIN = 0.8
+
+# The fewest held-out inputs to select on without a warning.
+MIN_INPUTS = 1000
+
+CANDIDATES = [25, 50, 100, 150, 200, 300, 400, 500, 750, 1000, 1500]
+
+
+def tree_predictions(model, X):
+    """
+    Returns the n_trees x n_samples predictions of every tree in a forest.
+    """
+    return np.array([est.predict(X) for est in model.estimators_])
+
+
+def subset_deviation(tree_preds, n_trees, percentile=95):
+    """
+    Returns the mean absolute deviation, over samples, of the first
+    `n_trees` trees from the full forest: of the ensemble mean, and of the
+    lower bound, median and upper bound of the central interval (worst of
+    the three).
+    """
+    low = (100 - percentile) / 2
+    q = [low, 50, 100 - low]
+    subset = tree_preds[:n_trees]
+
+    mean_dev = np.abs(subset.mean(axis=0) - tree_preds.mean(axis=0)).mean()
+    interval_dev = np.abs(np.percentile(subset, q, axis=0) -
+                          np.percentile(tree_preds, q, axis=0))\
+        .mean(axis=1).max()
+    return mean_dev, interval_dev
+
+
+def select_n_trees(model, X, tolerance=0.05, percentile=95,
+                   candidates=CANDIDATES, margin=MARGIN):
+    """
+    Returns the smallest number of trees whose mean and intervals stay within
+    `margin` * `tolerance` (in log10 units) of the full forest on the
+    held-out inputs X.
+
+    Parameters:
+    ===========
+    - model: (fitted forest) the full model.
+    - X: (np.array) held-out inputs, n_samples x n_features; at least
+         MIN_INPUTS of them (e.g. custom_funcs.get_untrained_inputs).
+    - tolerance: (float) maximum mean absolute deviation allowed.
+    - margin: (float) fraction of the tolerance to select at.
+    - percentile: (float) the central interval that is compared.
+    - candidates: (list) the numbers of trees to try, smallest first.
+
+    Returns:
+    ========
+    - n_trees: (int) the selected number of trees; all of them if no smaller
+               candidate is within tolerance.
+    - deviations: (list) of (n_trees, mean_dev, interval_dev) for each
+                  candidate tried.
+    """
+    if len(X) < MIN_INPUTS:
+        warnings.warn('selecting the number of trees on only {0} inputs; '
+                      'the selection may not hold on new sequences'
+                      .format(len(X)))
+    tree_preds = tree_predictions(model, X)
+    n_total = len(tree_preds)
+
+    deviations = list()
+    for n_trees in sorted(candidates):
+        if n_trees >= n_total:
+            break
+        mean_dev, interval_dev = subset_deviation(tree_preds, n_trees,
+                                                  percentile)
+        deviations.append((n_trees, mean_dev, interval_dev))
+        if max(mean_dev, interval_dev) <= margin * tolerance:
+            return n_trees, deviations
+
+    return n_total, deviations
+
+
+def check_n_trees(model, X, n_trees, tolerance=0.05, percentile=95):
+    """
+    Returns True if the first `n_trees` trees stay within `tolerance` of the
+    full forest on the held-out inputs X (without a margin).
+    """
+    mean_dev, interval_dev = subset_deviation(tree_predictions(model, X),
+                                              n_trees, percentile)
+    return max(mean_dev, interval_dev) <= tolerance
@@ -3,8 +3,12 @@ import pandas as pd
 from Bio import SeqIO
 from molecular_weight import molecular_weights
 from isoelectric_point import isoelectric_points
-from sklearn.cross_validation import train_test_split
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import MinMaxScaler
+import gsdash.residue_matrix as rm
+from gsdash.compaction import compact
+from gsdash.sparse_encoding import sparse_encode
+from gsdash.sequence_store import SequenceStore
 
 allowed_drugnames = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV',
                      '3TC', 'ABC', 'AZT', 'D4T', 'DDI', 'TDF', 'EFV', 'NVP',
@@ -52,6 +56,23 @@ def read_data(protein, sparse=True):
     return data, drug_cols, feat_cols
 
 
+def read_residue_data(protein, sparse=True):
+    """
+    Reads in the data for the protein as a uint8 residue matrix, without
+    going through pandas. See gsdash.residue_matrix for the residue codes.
+
+    Same file options as `read_data`. Returns a gsdash.residue_matrix.HIVData.
+    """
+    assert protein in drug_col_vals.keys()
+
+    if sparse:
+        path = '../data/hiv-{0}-data-sparse.csv'.format(protein)
+    else:
+        path = '../data/hiv-{0}-data.csv'.format(protein)
+
+    return rm.read_residue_data(path, drug_col_vals[protein])
+
+
 def replace_ambiguous_letters_with_nan(df, feat_cols):
     """
     Within the dataframe `df`, replaces all cells amongst the feature columns
@@ -202,6 +223,147 @@ def get_cleaned_data(drug_class, drug_name):
     return data, feat_cols
 
 
+def get_cleaned_multidrug_data(drug_class, drug_names):
+    """
+    Like `get_cleaned_data`, but keeps all of the given drug columns, for
+    training a single multi-output model per protein.
+
+    Rows with ambiguous sequence positions are dropped, as are rows with no
+    resistance data for any of the drugs. Drug columns are log10 transformed
+    and may still contain NaN where a sequence was not tested on a drug.
+    """
+    data, drug_cols, feat_cols = get_protein_drug_data(drug_class)
+    data = data.dropna(subset=list(feat_cols))
+    data = data.dropna(subset=list(drug_names), how='all')
+    columns = list(feat_cols) + list(drug_names)
+    data = data[columns].copy()
+    for drug_name in drug_names:
+        data[drug_name] = np.log10(data[drug_name].astype(float))
+
+    return data, feat_cols
+
+
+def get_untrained_inputs(X_train, drug_class='protease'):
+    """
+    Returns held-out inputs for a model trained on X_train: the distinct
+    sequences of the clean data and of the mixture-expanded data, encoded
+    by molecular weight, that are not rows of X_train. No drug values are
+    needed, so these number in the thousands, where the sequences without a
+    value for a given drug can be a few dozen.
+
+    Returns an n_sequences x n_positions array.
+    """
+    data, drug_cols, feat_cols = get_protein_drug_data(drug_class)
+    sequences = data[list(feat_cols)].dropna()
+
+    expanded = pd.read_csv('../data/hiv-{0}-data-expanded.csv'.format(
+        drug_class), usecols=['sequence'])['sequence'].str.upper()
+    expanded = expanded[~expanded.str.contains('[X*]') &
+                        (expanded.str.len() == len(feat_cols))]
+    sequences = pd.concat([sequences, pd.DataFrame(
+        [list(s) for s in expanded], columns=feat_cols)])
+
+    X = np.unique(to_numeric_rep(sequences, feat_cols, rep='mw')
+                  .values.astype(float), axis=0)
+    trained = {row.tobytes() for row in np.asarray(X_train, dtype=float)}
+    return X[[row.tobytes() not in trained for row in X]]
+
+
+def get_cleaned_expanded_data(drug_name):
+    """
+    Reads the expanded protease data, in which every sequence with mixtures
+    has been expanded into all of its possible sequences, each carrying a
+    `weight` that sums to 1 per original sequence.
+
+    Returns a clean dataframe in the same layout as `get_cleaned_data` (one
+    column per position, then the log10 drug resistance column), plus the
+    `weight` and original `SeqID` columns. Sequences with ambiguous letters
+    or stop codons are dropped.
+    """
+    assert drug_name in allowed_drugnames
+
+    path = '../data/hiv-protease-data-expanded.csv'
+    data = pd.read_csv(path, index_col=0,
+                       usecols=['Unnamed: 0', 'SeqID', 'sequence', 'weight',
+                                drug_name])
+    data = data.dropna(subset=[drug_name])
+    data['sequence'] = data['sequence'].str.upper()
+    data = data[~data['sequence'].str.contains('[X*]')]
+
+    feat_cols = ['P{0}'.format(i + 1) for i in range(99)]
+    seqs = pd.DataFrame([list(s) for s in data['sequence']],
+                        index=data.index, columns=feat_cols)
+    seqs[drug_name] = np.log10(data[drug_name])
+    seqs['weight'] = data['weight']
+    seqs['SeqID'] = data['SeqID']
+
+    return seqs, feat_cols
+
+
+def get_onehot_data(drug_class, k=None):
+    """
+    Reads the sparse data file straight into the sparse one-hot (+ k-mer)
+    encoding of gsdash.sparse_encoding, without going through pandas.
+
+    Unlike `get_cleaned_data`, no rows are dropped: mixture cells are spread
+    over their letters and unknown cells are left empty.
+
+    Returns:
+    ========
+    - X: (scipy.sparse.csr_matrix) the encoded sequences, one row per SeqID.
+    - drug_values: (np.array) n_rows x n_drugs, not log10 transformed, NaN
+                   where a sequence was not tested on a drug.
+    - drug_cols: (list) the drug names.
+    """
+    data = read_residue_data(drug_class)
+    consensus_map = read_consensus(drug_class)
+    consensus = ''.join(consensus_map[i] for i in range(len(consensus_map)))
+    residues = rm.fill_consensus(data.residues, consensus)
+    X = sparse_encode(residues, k=k, mixtures=data.mixtures)
+
+    return X, data.drug_values, data.drug_cols
+
+
+def get_sequence_store(drug_class):
+    """
+    Reads the sparse data file into a gsdash.sequence_store.SequenceStore of
+    its consensus-filled sequences, each distinct sequence stored once.
+    Mixture cells are stored with their letters.
+
+    Returns:
+    ========
+    - store: (SequenceStore) the distinct sequences.
+    - indices: (np.array) the store index of each data row.
+    - data: (gsdash.residue_matrix.HIVData) the data file, for its SeqIDs
+            and drug values.
+    """
+    data = read_residue_data(drug_class)
+    consensus_map = read_consensus(drug_class)
+    consensus = ''.join(consensus_map[i] for i in range(len(consensus_map)))
+    residues = rm.fill_consensus(data.residues, consensus)
+    store = SequenceStore(capacity=len(residues), length=residues.shape[1])
+    indices = store.add_codes(residues, mixtures=data.mixtures)
+
+    return store, indices, data
+
+
+def compact_data(data, feat_cols, drug_name, weight_col=None):
+    """
+    Collapses duplicate (feature row, drug value) pairs into unique rows with
+    summed sample weights. See gsdash.compaction.
+
+    Returns:
+    ========
+    - X, Y: (np.array) the unique feature rows and drug values.
+    - W: (np.array) the sample weight of each unique row; the number of
+         duplicates, or the sum of `weight_col` over them.
+    """
+    weights = data[weight_col].values if weight_col else None
+    X, Y, W, _ = compact(data[feat_cols].values.astype(float),
+                         data[drug_name].values.astype(float), weights)
+    return X, Y, W
+
+
 def to_numeric_rep(df, feat_cols, rep='mw'):
     df_new = df.copy()
     allowed_rep = ['mw', 'pKa']
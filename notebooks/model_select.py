@@ -8,7 +8,11 @@ from sklearn.ensemble import (AdaBoostRegressor,
                               ExtraTreesRegressor,
                               GradientBoostingRegressor,
                               RandomForestRegressor)
-from sklearn.grid_search import GridSearchCV
+from sklearn.model_selection import GridSearchCV, ParameterGrid
+from sklearn.base import clone
+from sklearn import config_context
+from sklearn.metrics import get_scorer
+from gsdash.evaluation import evaluate
 import numpy as np
 
 shortnames = dict()
@@ -46,15 +50,56 @@ params['rfr'] = {'max_features': np.arange(0.1, 1.1, 0.2),
                  }
 
 
-def find_best_params(mdl, cv, scoring, X, Y):
+def find_best_params(mdl, cv, scoring, X, Y, sample_weight=None):
     """
     Uses scikit-learn's GridSearchCV class to search across reasonable
     parameter range defaults, which are in turn specified above.
+
+    Pass the weights from custom_funcs.compact_data as `sample_weight` when
+    X and Y have been compacted; they are split along with each CV fold and
+    routed to both the fit and the scorer, so that each unique row counts
+    as many times as it was duplicated, as it would on the raw rows.
+    `scoring` must then be a scorer name (or None for R^2).
     """
     assert mdl in models.keys(), "mdl must be one of {0}".format(models.keys())
 
-    gs = GridSearchCV(models[mdl], params[mdl], n_jobs=-1, verbose=3, cv=cv,
-                      scoring=scoring)
-    gs.fit(X, Y)
+    if sample_weight is None:
+        gs = GridSearchCV(models[mdl], params[mdl], n_jobs=-1, verbose=3,
+                          cv=cv, scoring=scoring)
+        gs.fit(X, Y)
+        return gs
+
+    with config_context(enable_metadata_routing=True):
+        estimator = clone(models[mdl]).set_fit_request(sample_weight=True)
+        scorer = get_scorer(scoring or 'r2')\
+            .set_score_request(sample_weight=True)
+        gs = GridSearchCV(estimator, params[mdl], n_jobs=-1, verbose=3,
+                          cv=cv, scoring=scorer)
+        gs.fit(X, Y, sample_weight=sample_weight)
 
     return gs
+
+
+def find_best_params_oob(mdl, X, Y, sample_weight=None, cache_dir=None,
+                         cv=5):
+    """
+    Searches the same parameter grid as `find_best_params`, but scores each
+    candidate with gsdash.evaluation.evaluate: bagged candidates are fit once
+    and scored out-of-bag, the rest are cross-validated with their folds fit
+    in parallel. Predictions are cached in `cache_dir`.
+
+    Returns the best parameters, and a list of (params, metrics) sorted by
+    decreasing R^2.
+    """
+    assert mdl in models.keys(), "mdl must be one of {0}".format(models.keys())
+
+    results = list()
+    for candidate in ParameterGrid(params[mdl]):
+        estimator = clone(models[mdl]).set_params(**candidate)
+        metrics = evaluate(estimator, X, Y, sample_weight=sample_weight,
+                           cv=cv, cache_dir=cache_dir)
+        print(candidate, metrics['method'], metrics['r2'])
+        results.append((candidate, metrics))
+
+    results.sort(key=lambda r: r[1]['r2'], reverse=True)
+    return results[0][0], results
@@ -0,0 +1,76 @@
+"""
+Benchmarks gsdash.alignment on simulated near-consensus sequences.
+
+Each simulated sequence carries random substitutions and, for a fraction of
+them, a few random insertions and deletions. Reports throughput and the
+fraction of consensus positions that were mapped to the correct query
+residue.
+
+Usage: python bench_alignment.py [protein] [n_sequences]
+"""
+from gsdash.alignment import (read_fasta_sequence, to_codes,
+                              banded_alignment, align_to_consensus)
+from time import time
+import numpy as np
+import sys
+
+amino_acids = 'ACDEFGHIKLMNPQRSTVWY'
+protein = sys.argv[1] if len(sys.argv) > 1 else 'protease'
+n = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+consensus = read_fasta_sequence('../data/hiv-{0}-consensus.fasta'.format(
+    protein))
+
+
+def simulate(rng, substitution_rate=0.1, indel_fraction=0.5, max_indels=3):
+    """
+    Returns a mutated consensus, and the true query index of every consensus
+    position (-1 if deleted).
+    """
+    residues = list(consensus)
+    origin = list(range(len(consensus)))
+    for pos in np.where(rng.random_sample(len(residues)) <
+                        substitution_rate)[0]:
+        residues[pos] = amino_acids[rng.randint(20)]
+    if rng.random_sample() < indel_fraction:
+        for _ in range(rng.randint(1, max_indels + 1)):
+            pos = rng.randint(1, len(residues) - 1)
+            size = rng.randint(1, 4)
+            if rng.random_sample() < 0.5:
+                del residues[pos:pos + size]
+                del origin[pos:pos + size]
+            else:
+                residues[pos:pos] = [amino_acids[rng.randint(20)]
+                                     for _ in range(size)]
+                origin[pos:pos] = [-1] * size
+    truth = np.full(len(consensus), -1)
+    for q, c in enumerate(origin):
+        if c >= 0:
+            truth[c] = q
+    return ''.join(residues), truth
+
+
+rng = np.random.RandomState(0)
+sequences, truths = zip(*[simulate(rng) for _ in range(n)])
+
+t = time()
+align_to_consensus(sequences, consensus)
+elapsed = time() - t
+print('{0}: {1} sequences in {2:.2f} s ({3:.0f} sequences/s)'.format(
+    protein, n, elapsed, n / elapsed))
+
+# Mapping accuracy, measured on the DP path for every sequence.
+codes, lengths = to_codes(sequences)
+cons_codes = np.frombuffer(consensus.encode('ascii'), dtype=np.uint8)
+t = time()
+mapping = np.vstack([banded_alignment(codes[i:i + 256], lengths[i:i + 256],
+                                      cons_codes)
+                     for i in range(0, n, 256)])
+elapsed = time() - t
+truths = np.array(truths)
+print('DP only: {0:.0f} sequences/s, {1:.4f} of positions mapped '
+      'correctly'.format(n / elapsed, (mapping == truths).mean()))
+
+stretched = np.array([np.round(np.linspace(0, len(s) - 1, len(consensus)))
+                      for s in sequences])
+print('linear stretching (standardize_sequence): {0:.4f} of positions '
+      'mapped correctly'.format((stretched == truths).mean()))
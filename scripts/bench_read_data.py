@@ -0,0 +1,42 @@
+"""
+Compares custom_funcs.read_data (pandas) with custom_funcs.read_residue_data
+(uint8 residue matrix) on all six hiv-*-data*.csv files.
+
+Reports the best-of-3 load time, the peak memory allocated while loading
+(tracemalloc), and the size of the result.
+
+Usage: python bench_read_data.py
+"""
+from timeit import repeat
+import custom_funcs as cf
+import tracemalloc
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, peak
+
+
+def result_size(result):
+    if isinstance(result, tuple) and hasattr(result, 'residues'):
+        return (result.residues.nbytes + result.drug_values.nbytes +
+                sum(len(s) for s in result.seqids))
+    return result[0].memory_usage(deep=True).sum()
+
+
+print('{0:>9} {1:>6} {2:>8} {3:>10} {4:>10} {5:>10}'.format(
+    'protein', 'sparse', 'loader', 'time (ms)', 'peak (MB)', 'size (MB)'))
+for protein in ['protease', 'nnrt', 'nrt']:
+    for sparse in [True, False]:
+        loaders = [('pandas', lambda: cf.read_data(protein, sparse=sparse)),
+                   ('uint8', lambda: cf.read_residue_data(protein,
+                                                          sparse=sparse))]
+        for name, loader in loaders:
+            t = min(repeat(loader, number=1, repeat=3))
+            result, peak = peak_memory(loader)
+            print('{0:>9} {1!s:>6} {2:>8} {3:10.1f} {4:10.2f} {5:10.2f}'
+                  .format(protein, sparse, name, t * 1000, peak / 1e6,
+                          result_size(result) / 1e6))
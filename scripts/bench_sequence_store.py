@@ -0,0 +1,89 @@
+"""
+Benchmarks gsdash.sequence_store on a simulated surveillance set: the
+expanded protease sequences, with random point mutations, repeated up to
+n_sequences (about a third of them duplicates). Sequences with residues
+the store does not accept (e.g. 'X') are left out.
+
+Compares the memory of the store with the same sequences held as Python
+strings and as a pandas frame of one object cell per residue (the
+custom_funcs layout, measured on a sample and scaled up; only the cell
+pointers are counted, as single-letter strings are shared), and reports the
+time to build, look up, save and memory-map the store.
+
+Usage: python bench_sequence_store.py [n_sequences]
+"""
+from gsdash.residue_matrix import ALPHABET, AMINO_ACIDS, MIXTURE
+from gsdash.sequence_store import SequenceStore
+from tempfile import mkdtemp
+from time import time
+import numpy as np
+import os
+import pandas as pd
+import sys
+
+n_sequences = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+with open('../data/hiv-protease-sequences-expanded.fasta') as f:
+    records = f.read().split('>')[1:]
+base = [''.join(r.splitlines()[1:]) for r in records]
+base = [s for s in base
+        if len(s) == 99 and set(s) <= set(ALPHABET[:MIXTURE])]
+
+# Point-mutate two thirds of the draws, so that the rest are duplicates.
+rng = np.random.RandomState(42)
+sequences = list()
+for k in range(n_sequences):
+    s = base[rng.randint(len(base))]
+    if rng.rand() < 2 / 3:
+        pos = rng.randint(len(s))
+        s = s[:pos] + AMINO_ACIDS[rng.randint(20)] + s[pos + 1:]
+    sequences.append(s)
+
+t = time()
+store = SequenceStore(capacity=n_sequences, length=99)
+indices = store.add_many(sequences)
+build_time = time() - t
+
+t = time()
+for s in sequences[:10000]:
+    store.find(s)
+find_time = (time() - t) / 10000
+
+path = mkdtemp(prefix='sequence-store-')
+store.save(os.path.join(path, 'plain'))
+store.save(os.path.join(path, 'packed'), packed=True)
+t = time()
+loaded = SequenceStore.load(os.path.join(path, 'plain'))
+mmap_time = time() - t
+assert loaded.sequence(indices[-1]) == sequences[-1]
+
+
+def dir_size(d):
+    return sum(os.path.getsize(os.path.join(d, f)) for f in os.listdir(d))
+
+
+def string_size(s):
+    return sys.getsizeof(s) + 8  # plus the list's pointer
+
+
+sample = sequences[:10000]
+frame = pd.DataFrame([list(s) for s in sample])
+frame_bytes = frame.memory_usage().sum() * n_sequences / len(sample)
+strings_bytes = sum(string_size(s) for s in sample) * n_sequences / \
+    len(sample)
+# Leave out the spare capacity of the codes and of the (unused) mixture cells.
+store_bytes = (store.nbytes - len(store._codes) + store._n_codes -
+               store._mix_positions.nbytes - store._mix_masks.nbytes)
+
+print('{0} sequences, {1} distinct'.format(n_sequences, len(store)))
+print('memory (MB): pandas cell pointers {0:.0f}, strings {1:.0f}, '
+      'store {2:.0f} (codes {3:.0f}, index {4:.0f})'.format(
+          frame_bytes / 1e6, strings_bytes / 1e6, store_bytes / 1e6,
+          store._n_codes / 1e6, store._table.nbytes / 1e6))
+print('on disk (MB): uint8 {0:.0f}, 5-bit packed {1:.0f}'.format(
+    dir_size(os.path.join(path, 'plain')) / 1e6,
+    dir_size(os.path.join(path, 'packed')) / 1e6))
+print('build {0:.2f}s ({1:.2f} us/seq), find {2:.2f} us, '
+      'memory-map load {3:.4f}s'.format(
+          build_time, build_time / n_sequences * 1e6, find_time * 1e6,
+          mmap_time))
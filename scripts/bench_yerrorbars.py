@@ -0,0 +1,25 @@
+"""
+Benchmarks gsdash.bokehutils.yerrorbars at cohort-plot scale.
+
+Usage: python bench_yerrorbars.py
+"""
+from timeit import repeat
+from gsdash.bokehutils import yerrorbars
+
+import numpy as np
+
+sizes = [10000, 100000, 1000000]
+
+for n in sizes:
+    data = {'x': np.random.randint(0, 1000, size=n),
+            'y': np.random.normal(size=n)}
+    cases = [('scalar', 0.5),
+             ('symmetric', np.random.random(n)),
+             ('asymmetric', np.random.random((n, 2)))]
+    for name, errors in cases:
+        for sort in [False, True]:
+            t = min(repeat(lambda: yerrorbars(data, errors, 'x', 'y',
+                                              sort=sort),
+                           number=1, repeat=3))
+            print('n={0:>8} {1:>11} sort={2!s:<5} {3:8.4f} s'.format(
+                n, name, sort, t))
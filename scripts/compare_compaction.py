@@ -0,0 +1,56 @@
+"""
+Checks that training on compacted data (duplicate rows collapsed into
+weighted unique rows) gives the same model quality as training on the raw
+rows of the expanded protease data, and reports the savings.
+
+Train/test splits are made by original sequence (SeqID), so expansions of
+the same sequence never end up on both sides.
+
+Usage: python compare_compaction.py [n_estimators]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import GroupShuffleSplit
+from time import time
+import custom_funcs as cf
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+print('{0:>5} {1:>6} {2:>6} {3:>8} {4:>8} {5:>8} {6:>8} {7:>8} {8:>8}'
+      .format('drug', 'rows', 'unique', 'R2 raw', 'R2 comp', 'fit raw',
+              'fit comp', 'MB raw', 'MB comp'))
+for drug in drugs:
+    data, feat_cols = cf.get_cleaned_expanded_data(drug)
+    data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+
+    split = GroupShuffleSplit(n_splits=1, test_size=0.3, random_state=42)
+    train, test = next(split.split(data_numeric, groups=data['SeqID']))
+    train_data = data_numeric.iloc[train]
+    test_data = data_numeric.iloc[test]
+
+    X_raw = train_data[feat_cols].values.astype(float)
+    Y_raw = train_data[drug].values.astype(float)
+    W_raw = train_data['weight'].values
+    X, Y, W = cf.compact_data(train_data, feat_cols, drug, 'weight')
+
+    X_test = test_data[feat_cols].values.astype(float)
+    Y_test = test_data[drug].values.astype(float)
+    W_test = test_data['weight'].values
+
+    results = list()
+    for X_fit, Y_fit, W_fit in [(X_raw, Y_raw, W_raw), (X, Y, W)]:
+        mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=1,
+                                    random_state=42)
+        t = time()
+        mdl.fit(X_fit, Y_fit, sample_weight=W_fit)
+        results.append((r2_score(Y_test, mdl.predict(X_test),
+                                 sample_weight=W_test),
+                        time() - t, X_fit.nbytes / 1e6))
+
+    print('{0:>5} {1:>6} {2:>6} {3:8.3f} {4:8.3f} {5:8.2f} {6:8.2f} '
+          '{7:8.2f} {8:8.2f}'.format(drug, len(X_raw), len(X),
+                                     results[0][0], results[1][0],
+                                     results[0][1], results[1][1],
+                                     results[0][2], results[1][2]))
@@ -0,0 +1,81 @@
+"""
+Compares the dense per-position molecular weight / pKa representations with
+the sparse one-hot (+ 2-mer) encoding of gsdash.sparse_encoding: feature
+matrix memory, random forest fit time and held-out R2.
+
+All encodings are built from the same residue matrix and scored on the same
+rows: sequences with a value for the drug and no unknown or mixture cells,
+since the dense representations cannot encode those.
+
+Usage: python compare_encodings.py [n_estimators]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+from gsdash.sparse_encoding import N_CODES, sparse_encode
+from molecular_weight import molecular_weights
+from isoelectric_point import isoelectric_points
+from time import time
+import gsdash.residue_matrix as rm
+import custom_funcs as cf
+import numpy as np
+import sys
+
+drugs = [('protease', 'FPV'), ('protease', 'NFV'), ('nnrt', 'EFV'),
+         ('nnrt', 'NVP'), ('nrt', '3TC'), ('nrt', 'AZT')]
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+def numeric_table(values):
+    # Residue code -> value lookup, for the amino acid codes.
+    table = np.zeros(N_CODES)
+    for code, letter in enumerate(rm.AMINO_ACIDS, start=1):
+        table[code] = values[letter]
+    return table
+
+
+tables = dict(mw=numeric_table(molecular_weights),
+              pKa=numeric_table(isoelectric_points))
+
+print('{0:>8} {1:>4} {2:>5} {3:>4} {4:>9} {5:>8} {6:>8} {7:>7}'
+      .format('protein', 'drug', 'rows', 'pos', 'encoding', 'MB', 'fit s',
+              'R2'))
+for drug_class, drug in drugs:
+    data = cf.read_residue_data(drug_class)
+    consensus_map = cf.read_consensus(drug_class)
+    consensus = ''.join(consensus_map[i] for i in range(len(consensus_map)))
+    residues = rm.fill_consensus(data.residues, consensus)
+
+    values = data.drug_values[:, data.drug_cols.index(drug)]
+    is_aa = (residues >= 1) & (residues <= len(rm.AMINO_ACIDS))
+    rows = np.where(~np.isnan(values) & is_aa.all(axis=1))[0]
+    residues = residues[rows]
+    Y = np.log10(values[rows])
+    train, test = train_test_split(np.arange(len(rows)), test_size=0.3,
+                                   random_state=42)
+
+    n_rows, n_positions = residues.shape
+    encodings = [(rep, tables[rep][residues]) for rep in ('mw', 'pKa')]
+    encodings.append(('onehot', sparse_encode(residues)))
+    encodings.append(('onehot+2', sparse_encode(residues, k=2)))
+
+    for name, X in encodings:
+        if hasattr(X, 'indptr'):
+            nbytes = X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+        else:
+            nbytes = X.nbytes
+        mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=1,
+                                    random_state=42)
+        t = time()
+        mdl.fit(X[train], Y[train])
+        fit_time = time() - t
+        r2 = r2_score(Y[test], mdl.predict(X[test]))
+        print('{0:>8} {1:>4} {2:>5} {3:>4} {4:>9} {5:8.2f} {6:8.2f} '
+              '{7:7.3f}'.format(drug_class, drug, n_rows, n_positions, name,
+                                nbytes / 1e6, fit_time, r2))
+
+    # For reference: the same one-hot encoding held as a dense float32
+    # matrix.
+    print('{0:>8} {1:>4} {2:>5} {3:>4} {4:>9} {5:8.2f}'.format(
+        drug_class, drug, n_rows, n_positions, 'dense oh',
+        n_rows * n_positions * N_CODES * 4 / 1e6))
@@ -0,0 +1,69 @@
+"""
+Reports, per drug, the number of trees selected for fast mode and its
+trade-off against the full forest:
+
+- speedup of scoring one sequence (per-tree predictions, as the predictor
+  does),
+- mean absolute deviation of the ensemble mean and of the 95% interval
+  bounds from the full forest, on sequences held out from training,
+- held-out R^2 of the full forest and of the fast subset.
+
+Forests are trained on 70% of each drug's data. Trees are selected, as in
+make_base_models, on the untrained sequences of custom_funcs.
+get_untrained_inputs (excluding the test rows) at `margin` times the
+tolerance. The deviations and R^2 are measured on the remaining 30%, and
+`ok` says whether both deviations are within the tolerance there.
+
+Usage: python compare_fast_mode.py [n_estimators] [tolerance] [margin]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from gsdash.compaction import compact
+from gsdash.predutils import pred_range
+from gsdash.tree_subset import (MARGIN, select_n_trees, subset_deviation,
+                                tree_predictions)
+from timeit import repeat
+import custom_funcs as cf
+import numpy as np
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+protein = 'protease'
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+tolerance = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+margin = float(sys.argv[3]) if len(sys.argv) > 3 else MARGIN
+
+print('{0:>5} {1:>6} {2:>8} {3:>9} {4:>9} {5:>4} {6:>8} {7:>8}'.format(
+    'drug', 'trees', 'speedup', 'mean dev', 'intv dev', 'ok', 'R2 full',
+    'R2 fast'))
+for drug in drugs:
+    data, feat_cols = cf.get_cleaned_data(protein, drug)
+    data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+    X, Y, X_train, X_test, Y_train, Y_test = cf.to_train_test_split(
+        data_numeric, feat_cols, drug, test_size=0.3)
+    X_train, Y_train, W, _ = compact(X_train.values.astype(float), Y_train)
+    X_test = X_test.values.astype(float)
+
+    mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1)
+    mdl.fit(X_train, Y_train, sample_weight=W)
+
+    # Select on sequences used neither for training nor for testing.
+    heldout = cf.get_untrained_inputs(np.vstack([X_train, X_test]))
+    n_trees, _ = select_n_trees(mdl, heldout, tolerance=tolerance,
+                                margin=margin)
+
+    tree_preds = tree_predictions(mdl, X_test)
+    mean_dev, interval_dev = subset_deviation(tree_preds, n_trees)
+    r2_full = r2_score(Y_test, tree_preds.mean(axis=0))
+    r2_fast = r2_score(Y_test, tree_preds[:n_trees].mean(axis=0))
+
+    seq = X_test[:1]
+    t_full = min(repeat(lambda: pred_range(mdl, seq), number=1, repeat=3))
+    t_fast = min(repeat(lambda: pred_range(mdl, seq, n_trees), number=1,
+                        repeat=3))
+
+    ok = mean_dev <= tolerance and interval_dev <= tolerance
+    print('{0:>5} {1:>6} {2:7.1f}x {3:9.4f} {4:9.4f} {5:>4} {6:8.3f} '
+          '{7:8.3f}'.format(drug, n_trees, t_full / t_fast, mean_dev,
+                            interval_dev, 'yes' if ok else 'NO', r2_full,
+                            r2_fast))
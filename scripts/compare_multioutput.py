@@ -0,0 +1,64 @@
+"""
+Compares per-drug forests (as in make_base_models.py) with a single
+multi-output forest (as in make_multioutput_models.py) on the same held-out
+sequences.
+
+Reports, per drug, the held-out R^2 of both approaches, and the time taken to
+score a single sequence across all drugs the way the predictor does (every
+tree's prediction, for the uncertainty plot).
+
+Usage: python compare_multioutput.py [n_estimators]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+from gsdash.multioutput import fit_multioutput_forest
+from gsdash.predutils import pred_range, multioutput_pred_range
+from timeit import repeat
+import custom_funcs as cf
+import numpy as np
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+protein = 'protease'
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+data, feat_cols = cf.get_cleaned_multidrug_data(protein, drugs)
+data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+X = data_numeric[feat_cols].values.astype(float)
+Y = data_numeric[drugs].values.astype(float)
+X_train, X_test, Y_train, Y_test = train_test_split(X, Y, test_size=0.3,
+                                                    random_state=42)
+
+per_drug = list()
+for i, drug in enumerate(drugs):
+    observed = ~np.isnan(Y_train[:, i])
+    mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1,
+                                random_state=42)
+    mdl.fit(X_train[observed], Y_train[observed, i])
+    per_drug.append(mdl)
+
+multi, _ = fit_multioutput_forest(X_train, Y_train, n_estimators=n_estimators,
+                                  n_jobs=-1, random_state=42)
+multi_preds = multi.predict(X_test)
+
+print('n_estimators={0}, train={1}, test={2}'.format(
+    n_estimators, len(X_train), len(X_test)))
+print('{0:>5} {1:>7} {2:>12} {3:>12}'.format('drug', 'n_test',
+                                             'R2 per-drug', 'R2 multi'))
+for i, drug in enumerate(drugs):
+    observed = ~np.isnan(Y_test[:, i])
+    r2_single = r2_score(Y_test[observed, i],
+                         per_drug[i].predict(X_test[observed]))
+    r2_multi = r2_score(Y_test[observed, i], multi_preds[observed, i])
+    print('{0:>5} {1:>7} {2:12.3f} {3:12.3f}'.format(
+        drug, observed.sum(), r2_single, r2_multi))
+
+seq = X_test[:1]
+t_single = min(repeat(lambda: [pred_range(mdl, seq) for mdl in per_drug],
+                      number=1, repeat=3))
+t_multi = min(repeat(lambda: multioutput_pred_range(multi, seq),
+                     number=1, repeat=3))
+print('per-sequence scoring, all drugs: per-drug {0:.3f} s, '
+      'multi-output {1:.3f} s ({2:.1f}x)'.format(t_single, t_multi,
+                                                 t_single / t_multi))
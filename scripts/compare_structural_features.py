@@ -0,0 +1,66 @@
+"""
+Checks whether the structural-neighbourhood features of gsdash.structure
+help: trains random forests on the per-position molecular weights alone and
+with the neighbourhood-averaged molecular weights and pKas appended, and
+reports held-out R2. Also times the batched features against encoding one
+sequence at a time.
+
+Usage: python compare_structural_features.py [n_estimators]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+from gsdash.isoelectric_point import isoelectric_points
+from gsdash.molecular_weight import molecular_weights
+from gsdash.structure import (load_contact_graph, neighbourhood_features,
+                              neighbourhood_operator, value_table)
+from time import time
+import gsdash.residue_matrix as rm
+import custom_funcs as cf
+import numpy as np
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+t = time()
+adjacency = load_contact_graph('../data/hiv-protease.pdb')
+operator = neighbourhood_operator(adjacency)
+print('contact graph: {0} positions, {1} adjacency entries, {2:.3f}s'
+      .format(adjacency.shape[0], adjacency.nnz, time() - t))
+
+data = cf.read_residue_data('protease')
+consensus_map = cf.read_consensus('protease')
+consensus = ''.join(consensus_map[i] for i in range(len(consensus_map)))
+residues = rm.fill_consensus(data.residues, consensus)
+
+t = time()
+nbr_mw = neighbourhood_features(residues, operator, molecular_weights)
+batch_time = time() - t
+t = time()
+for row in residues:
+    neighbourhood_features(row[None, :], operator, molecular_weights)
+loop_time = time() - t
+print('{0} sequences: batched {1:.4f}s, one at a time {2:.4f}s'.format(
+    len(residues), batch_time, loop_time))
+
+nbr_pka = neighbourhood_features(residues, operator, isoelectric_points)
+mw = value_table(molecular_weights)[residues]
+
+print('{0:>5} {1:>5} {2:>8} {3:>8}'.format('drug', 'rows', 'R2 mw',
+                                           'R2 +nbr'))
+for drug in drugs:
+    values = data.drug_values[:, data.drug_cols.index(drug)]
+    # The rows the dense molecular weight representation can encode.
+    rows = np.where(~np.isnan(values) & ~np.isnan(mw).any(axis=1))[0]
+    Y = np.log10(values[rows])
+    train, test = train_test_split(np.arange(len(rows)), test_size=0.3,
+                                   random_state=42)
+
+    r2 = list()
+    for X in [mw[rows], np.hstack([mw[rows], nbr_mw[rows], nbr_pka[rows]])]:
+        mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1,
+                                    random_state=42)
+        mdl.fit(X[train], Y[train])
+        r2.append(r2_score(Y[test], mdl.predict(X[test])))
+    print('{0:>5} {1:>5} {2:8.3f} {3:8.3f}'.format(drug, len(rows), *r2))
@@ -0,0 +1,34 @@
+"""
+Writes a per-drug metrics report (R^2, RMSE and calibration of the per-tree
+intervals) for the protease Random Forest models, using out-of-bag
+predictions instead of refits. See gsdash.evaluation.
+
+Usage: python evaluate_models.py [n_estimators] [report.json]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from gsdash.evaluation import evaluate, format_report
+from time import time
+import custom_funcs as cf
+import json
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+protein = 'protease'
+n_estimators = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+report_path = sys.argv[2] if len(sys.argv) > 2 else 'evaluation.json'
+
+metrics = dict()
+for drug in drugs:
+    data, feat_cols = cf.get_cleaned_data(protein, drug)
+    data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+    X, Y, W = cf.compact_data(data_numeric, feat_cols, drug)
+
+    t = time()
+    mdl = RandomForestRegressor(n_estimators=n_estimators, n_jobs=-1)
+    metrics[drug] = evaluate(mdl, X, Y, sample_weight=W,
+                             cache_dir='../models/evaluation-cache')
+    metrics[drug]['seconds'] = time() - t
+
+print(format_report(metrics))
+with open(report_path, 'w') as f:
+    json.dump(metrics, f, indent=2)
@@ -3,39 +3,111 @@ Makes all the models!
 
 Trains a Random Forest Regressor on the protease data. Provides a baseline
 model that's pickled to disk that all other models can be compared to.
+
+Usage: python make_base_models.py [--expanded | --onehot]
+
+With --expanded, trains on the expanded protease data (every mixture
+expanded into its possible sequences, with weights). Duplicate (sequence,
+phenotype) rows are collapsed into weighted unique rows before fitting.
+
+With --onehot, trains on the sparse one-hot + 2-mer encoding of
+gsdash.sparse_encoding instead of per-position molecular weights, also
+collapsed into weighted unique rows. The two flags cannot be combined.
 """
 
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.externals import joblib
+from gsdash.compaction import compact
+from gsdash.model_store import write_manifest
+from gsdash.tree_subset import MIN_INPUTS, select_n_trees
+from datetime import datetime
 import custom_funcs as cf
+import joblib
+import numpy as np
 import os
+import sys
 
 drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
 protein = 'protease'
+expanded = '--expanded' in sys.argv[1:]
+onehot = '--onehot' in sys.argv[1:]
+if expanded and onehot:
+    sys.exit('--expanded and --onehot cannot be combined')
+encoding = dict(rep='onehot', k=2) if onehot else dict(rep='mw')
+
+# Each run writes a new version directory that the predictor picks up once
+# the manifest is written. See gsdash.model_store.
+trained = datetime.now()
+version = trained.strftime('%Y-%m-%dT%H%M%S')
+version_dir = '../models/{version}/'.format(version=version)
+os.makedirs(version_dir)
+drug_files = list()
+fast_trees = dict()
+failed = list()
+
+if onehot:
+    X_all, drug_values, drug_cols = cf.get_onehot_data(protein,
+                                                       k=encoding['k'])
 
 for drug in drugs:
     print(drug)
-    data, feat_cols = cf.get_cleaned_data(protein, drug)
+    if onehot:
+        # Mixtures are kept as fractional one-hot entries instead of being
+        # dropped; duplicate rows are collapsed on the sparse matrix.
+        values = drug_values[:, drug_cols.index(drug)]
+        labelled = ~np.isnan(values)
+        X, Y, W, _ = compact(X_all[labelled], np.log10(values[labelled]))
+        print('{0} rows -> {1} unique rows'.format(labelled.sum(),
+                                                   X.shape[0]))
+        heldout = X_all[~labelled]
+    elif expanded:
+        data, feat_cols = cf.get_cleaned_expanded_data(drug)
+        weight_col = 'weight'
+    else:
+        data, feat_cols = cf.get_cleaned_data(protein, drug)
+        weight_col = None
+
+    if not onehot:
+        # Just checking:
+        cf.test_data_integrity(data)
 
-    # Just checking:
-    cf.test_data_integrity(data)
+        # Now, let's do data transformations.
+        data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
 
-    # Now, let's do data transformations.
-    data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+        # Collapse duplicate rows, so that fitting scales with unique
+        # genotypes.
+        X, Y, W = cf.compact_data(data_numeric, feat_cols, drug, weight_col)
+        print('{0} rows -> {1} unique rows'.format(len(data_numeric),
+                                                   len(X)))
 
-    # Finally, split the data into a training set, and test set.
-    X, Y, X_train, X_test, Y_train, Y_test = cf.to_train_test_split(
-        data_numeric, feat_cols, drug, test_size=0.3)
+        heldout = cf.get_untrained_inputs(X)
 
     print('training on {0}'.format(drug))
     mdl = RandomForestRegressor(n_estimators=2000, n_jobs=-1)
-    mdl.fit(X, Y)
-
-    if not os.path.exists('../models/base/{drug}/'.format(drug=drug)):
-        os.mkdir('../models/base/{drug}/'.format(drug=drug))
+    mdl.fit(X, Y, sample_weight=W)
 
+    # Pick the subset of trees served in fast mode, on sequences the model
+    # was not trained on. Drugs without enough of them, or without a subset
+    # that meets the tolerance, are reported and not given one: fast mode
+    # then serves their full forest.
+    if heldout.shape[0] < MIN_INPUTS:
+        failed.append((drug, 'only {0} held-out inputs'.format(
+            heldout.shape[0])))
     else:
-        print('../models/base/{drug}/ exists'.format(drug=drug))
+        n_trees, _ = select_n_trees(mdl, heldout)
+        if n_trees == len(mdl.estimators_):
+            failed.append((drug, 'no subset within tolerance'))
+        else:
+            fast_trees[drug] = n_trees
+            print('fast mode: {0} trees'.format(n_trees))
 
     print('writing model to disk...')
-    joblib.dump(mdl, '../models/base/{drug}/{drug}.pkl'.format(drug=drug))
+    fname = '{drug}.pkl'.format(drug=drug)
+    joblib.dump(mdl, os.path.join(version_dir, fname))
+    drug_files.append((drug, fname))
+
+write_manifest(version_dir, drug_files, trained.strftime('%Y-%m-%d'),
+               fast_trees=fast_trees, encoding=encoding)
+print('wrote model version {0}'.format(version))
+for drug, reason in failed:
+    print('{0}: no fast mode subset ({1}); fast mode serves all trees'
+          .format(drug, reason))
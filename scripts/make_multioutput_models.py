@@ -0,0 +1,41 @@
+"""
+Makes one multi-output model per protein!
+
+The alternative to make_base_models.py: trains a single Random Forest
+Regressor on all of the protease drugs at once, imputing the missing drug
+resistance values (see gsdash.multioutput). Writes a model version in which
+every drug points at the same model file, so the predictor traverses each
+tree once for all drugs.
+"""
+
+from gsdash.multioutput import fit_multioutput_forest
+from gsdash.model_store import write_manifest
+from datetime import datetime
+import custom_funcs as cf
+import joblib
+import os
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+protein = 'protease'
+
+trained = datetime.now()
+version = trained.strftime('%Y-%m-%dT%H%M%S')
+version_dir = '../models/{version}/'.format(version=version)
+os.makedirs(version_dir)
+
+data, feat_cols = cf.get_cleaned_multidrug_data(protein, drugs)
+data_numeric = cf.to_numeric_rep(data, feat_cols, rep='mw')
+X = data_numeric[feat_cols].values.astype(float)
+Y = data_numeric[drugs].values
+
+print('training on {0}'.format(drugs))
+mdl, _ = fit_multioutput_forest(X, Y, n_estimators=2000, n_jobs=-1)
+
+print('writing model to disk...')
+fname = '{protein}.pkl'.format(protein=protein)
+joblib.dump(mdl, os.path.join(version_dir, fname))
+
+write_manifest(version_dir,
+               [(drug, fname, i) for i, drug in enumerate(drugs)],
+               trained.strftime('%Y-%m-%d'))
+print('wrote model version {0}'.format(version))
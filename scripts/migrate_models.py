@@ -0,0 +1,17 @@
+"""
+One-off migration of models deployed in the old layout,
+../models/base/<drug>/<drug>.pkl, to a versioned model directory that the
+predictor serves (see gsdash.model_store). The pickles are hard-linked, not
+retrained.
+
+Usage: python migrate_models.py
+"""
+from gsdash.model_store import migrate_legacy
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+
+version = migrate_legacy('../models', drugs)
+if version is None:
+    print('no models found under ../models/base')
+else:
+    print('wrote model version {0}'.format(version))
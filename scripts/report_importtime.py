@@ -0,0 +1,41 @@
+"""
+Reports a `python -X importtime` breakdown for a module, sorted by cumulative
+import time.
+
+Usage: python report_importtime.py [module] [n]
+
+e.g. from the app/ directory:
+    python ../scripts/report_importtime.py predictor 20
+"""
+import subprocess
+import sys
+
+
+def importtime(module):
+    """
+    Returns a list of (cumulative_us, self_us, module) for every module
+    imported by `import module`, and the total cumulative time in us.
+    """
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                          'import {0}'.format(module)],
+                         stderr=subprocess.PIPE, universal_newlines=True,
+                         check=True).stderr
+    records = list()
+    for line in out.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        records.append((int(cumulative_us), int(self_us), name[1:].rstrip()))
+    total = sum(c for c, s, name in records if not name.startswith(' '))
+    return sorted(records, reverse=True), total
+
+
+if __name__ == '__main__':
+    module = sys.argv[1] if len(sys.argv) > 1 else 'gsdash'
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    records, total = importtime(module)
+    print('import {0}: {1:.1f} ms total'.format(module, total / 1000))
+    print('{0:>10} {1:>10}  module'.format('cum (ms)', 'self (ms)'))
+    for cumulative_us, self_us, name in records[:n]:
+        print('{0:10.1f} {1:10.1f}  {2}'.format(cumulative_us / 1000,
+                                                self_us / 1000, name))
@@ -0,0 +1,130 @@
+"""
+Load-tests the predictor service and reports throughput and p50/p95/p99
+latency at each concurrency level, as JSON.
+
+By default the predictor runs in-process (Flask test client) on small
+stand-in forests trained here on the protease data, so that neither a
+running service nor ../models is needed. With --url, requests go to a
+running service instead (which serves its own models).
+
+Usage: python run_loadgen.py [--endpoint /predict/batch] [--batch-size 1]
+                             [--mode full] [--concurrency 1,2,4,8]
+                             [--requests 200] [--n-estimators 100]
+                             [--url http://localhost:5550] [--output FILE]
+"""
+from sklearn.ensemble import RandomForestRegressor
+from gsdash.loadgen import client_sender, http_sender, latency_curve
+from gsdash.model_store import write_manifest
+from gsdash.molecular_weight import molecular_weights
+from gsdash.structure import value_table
+from tempfile import mkdtemp
+import gsdash.residue_matrix as rm
+import custom_funcs as cf
+import argparse
+import atexit
+import joblib
+import json
+import numpy as np
+import os
+import shutil
+import subprocess
+import sys
+
+drugs = ['FPV', 'ATV', 'IDV', 'LPV', 'NFV', 'SQV', 'TPV', 'DRV']
+
+parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+parser.add_argument('--endpoint', default='/predict/batch')
+parser.add_argument('--batch-size', type=int, default=1,
+                    help='sequences per /predict/batch request')
+parser.add_argument('--mode', default='full', choices=['full', 'fast'])
+parser.add_argument('--concurrency', default='1,2,4,8')
+parser.add_argument('--requests', type=int, default=200,
+                    help='requests per concurrency level')
+parser.add_argument('--n-estimators', type=int, default=100,
+                    help='trees per stand-in model')
+parser.add_argument('--url', help='load a running service instead')
+parser.add_argument('--output', help='write the JSON report here')
+args = parser.parse_args()
+
+# Clean protease sequences, used both to train the stand-in models and as
+# request payloads.
+data = cf.read_residue_data('protease')
+consensus_map = cf.read_consensus('protease')
+consensus = ''.join(consensus_map[i] for i in range(len(consensus_map)))
+residues = rm.fill_consensus(data.residues, consensus)
+X_all = value_table(molecular_weights)[residues]
+clean = ~np.isnan(X_all).any(axis=1)
+sequences = [rm.decode(row) for row in residues[clean]]
+
+if args.endpoint == '/predict':
+    payloads = [dict(sequence=s, mode=args.mode) for s in sequences]
+else:
+    payloads = [dict(sequences=sequences[i:i + args.batch_size],
+                     mode=args.mode)
+                for i in range(0, len(sequences) - args.batch_size + 1,
+                               args.batch_size)]
+json_body = args.endpoint != '/predict'
+
+root = None
+if args.url:
+    send = http_sender(args.url.rstrip('/') + args.endpoint, payloads,
+                       json_body)
+else:
+    # Train one small forest per drug into a throwaway model root, in the
+    # layout gsdash.model_store serves.
+    root = mkdtemp(prefix='load-test-')
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    version_dir = os.path.join(root, 'stand-in')
+    os.makedirs(version_dir)
+    drug_files = list()
+    fast_trees = dict()
+    for j, drug in enumerate(data.drug_cols):
+        rows = clean & ~np.isnan(data.drug_values[:, j])
+        mdl = RandomForestRegressor(n_estimators=args.n_estimators,
+                                    n_jobs=-1, random_state=42)
+        mdl.fit(X_all[rows], np.log10(data.drug_values[rows, j]))
+        mdl.n_jobs = 1
+        fname = '{0}.pkl'.format(drug)
+        joblib.dump(mdl, os.path.join(version_dir, fname))
+        drug_files.append((drug, fname))
+        fast_trees[drug] = max(1, args.n_estimators // 4)
+    write_manifest(version_dir, drug_files, 'stand-in',
+                   fast_trees=fast_trees, encoding=dict(rep='mw'))
+
+    # Point the predictor at the stand-ins before importing it, so that it
+    # never opens the real prediction log or watches the real models.
+    os.environ['PREDICTOR_MODELS'] = root
+    os.environ['PREDICTOR_LOG'] = os.path.join(root, 'predictions.sqlite')
+    sys.path.insert(0, os.path.join('..', 'app'))
+    import predictor as service
+
+    service.model_store.get()
+    send = client_sender(service.predictor, args.endpoint, payloads,
+                         json_body)
+
+try:
+    commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                     stderr=subprocess.DEVNULL)\
+        .decode('ascii').strip()
+except (OSError, subprocess.CalledProcessError):
+    commit = None
+
+levels = [int(c) for c in args.concurrency.split(',')]
+try:
+    curve = latency_curve(send, levels, args.requests, warmup=5)
+finally:
+    if root is not None:
+        service.model_store.stop_watcher()
+        service.prediction_log.close()
+
+report = dict(commit=commit, endpoint=args.endpoint, mode=args.mode,
+              batch_size=args.batch_size if json_body else 1,
+              transport='http' if args.url else 'in-process',
+              n_estimators=None if args.url else args.n_estimators,
+              levels=curve)
+
+output = json.dumps(report, indent=2)
+if args.output:
+    with open(args.output, 'w') as f:
+        f.write(output + '\n')
+print(output)
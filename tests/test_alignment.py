@@ -0,0 +1,73 @@
+from gsdash.alignment import (read_fasta_sequence, to_codes,
+                              banded_alignment, align_to_consensus)
+
+import numpy as np
+import os
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'data')
+consensus = read_fasta_sequence(os.path.join(data_dir,
+                                             'hiv-protease-consensus.fasta'))
+cons_codes = np.frombuffer(consensus.encode('ascii'), dtype=np.uint8)
+
+
+def align(sequences):
+    codes, lengths = to_codes(sequences)
+    return banded_alignment(codes, lengths, cons_codes)
+
+
+def test_read_fasta_sequence():
+    assert len(consensus) == 99
+    assert consensus.startswith('PQITLWQRPL')
+
+
+def test_ungapped_mapping():
+    mutant = consensus[:10] + 'W' + consensus[11:]
+    assert np.array_equal(align([mutant])[0], np.arange(99))
+    assert align_to_consensus([mutant.lower()], consensus) == [mutant]
+
+
+def test_deletion_mapping():
+    mutant = consensus[:30] + consensus[33:]
+    mapping = align([mutant])[0]
+    assert (mapping[:30] == np.arange(30)).all()
+    assert (mapping[30:33] == -1).all()
+    assert (mapping[33:] == np.arange(30, 96)).all()
+    # Deleted positions are filled in from the consensus.
+    assert align_to_consensus([mutant], consensus) == [consensus]
+
+
+def test_insertion_mapping():
+    mutant = consensus[:50] + 'WWW' + consensus[50:]
+    mapping = align([mutant])[0]
+    assert (mapping[:50] == np.arange(50)).all()
+    assert (mapping[50:] == np.arange(53, 102)).all()
+    assert align_to_consensus([mutant], consensus) == [consensus]
+
+
+def test_batch_of_mixed_lengths():
+    mutants = [consensus[5:],
+               consensus[:-4],
+               consensus[:20] + 'K' + consensus[20:70] + consensus[72:],
+               consensus]
+    aligned = align_to_consensus(mutants, consensus, batch_size=2)
+    assert aligned == [consensus] * 4
+
+
+def test_coverage_and_identity():
+    mutant = consensus[:10] + 'W' + consensus[11:]
+    aligned, coverage, matches = align_to_consensus(
+        [mutant, consensus[:-9], '', 'PQ'], consensus, return_stats=True)
+    assert np.allclose(coverage, [1, 90 / 99, 0, 2 / 99])
+    assert np.allclose(matches, [98 / 99, 1, 0, 1])
+
+
+def test_cancelling_indels_leave_the_fast_path():
+    # A deletion and an insertion 30 positions apart keep the length, but
+    # shift every residue between them.
+    mutant = consensus[:30] + consensus[31:60] + 'W' + consensus[60:]
+    assert len(mutant) == len(consensus)
+    # Its identity (0.73) alone would have let it through unaligned.
+    assert np.mean([a == b for a, b in zip(mutant, consensus)]) > 0.5
+    assert align_to_consensus([mutant], consensus, identity=0.5) == \
+        [consensus]
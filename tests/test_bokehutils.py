@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from gsdash.bokehutils import yerrorbars
+
+data = {'drug': ['SQV', 'ATV', 'FPV', 'ATV'],
+        'log10(DR)': [0.5, 1.0, -0.2, 2.0]}
+
+
+def test_yerrorbars_scalar():
+    xs, ys = yerrorbars(data, 0.5, 'drug', 'log10(DR)')
+    assert xs.shape == ys.shape == (4, 2)
+    assert np.allclose(xs[:, 0], [1, 2, 3, 4])
+    assert np.allclose(ys[1], [0.5, 1.5])
+
+
+@pytest.mark.parametrize('errors', [[0.1, 0.2, 0.3, 0.4],
+                                    (0.1, 0.2, 0.3, 0.4),
+                                    np.array([0.1, 0.2, 0.3, 0.4])])
+def test_yerrorbars_symmetric(errors):
+    xs, ys = yerrorbars(data, errors, 'drug', 'log10(DR)')
+    assert np.allclose(ys[:, 0], [0.4, 0.8, -0.5, 1.6])
+    assert np.allclose(ys[:, 1], [0.6, 1.2, 0.1, 2.4])
+
+
+def test_yerrorbars_asymmetric():
+    errors = np.array([[0.1, 1.0]] * 4)
+    xs, ys = yerrorbars(data, errors, 'drug', 'log10(DR)')
+    assert np.allclose(ys[0], [0.4, 1.5])
+
+
+def test_yerrorbars_sort():
+    xs, ys = yerrorbars(data, 0, 'drug', 'log10(DR)', sort=True)
+    # ATV (x=2, x=4), FPV (x=3), SQV (x=1); ties keep their input order.
+    assert np.allclose(xs[:, 0], [2, 4, 3, 1])
+    assert np.allclose(ys[:, 0], [1.0, 2.0, -0.2, 0.5])
+
+
+def test_yerrorbars_bad_length():
+    with pytest.raises(AssertionError):
+        yerrorbars(data, [0.1, 0.2], 'drug', 'log10(DR)')
@@ -0,0 +1,57 @@
+from gsdash.compaction import compact
+from sklearn.tree import DecisionTreeRegressor
+
+import numpy as np
+
+X = np.array([[1., 2.], [1., 2.], [3., 4.], [1., 2.], [3., 4.], [0., -0.]])
+Y = np.array([1., 1., 2., 5., 2., 3.])
+
+
+def test_compact():
+    X_u, Y_u, W, inverse = compact(X, Y)
+    # Unique rows appear in order of first appearance; (1, 2) with target 5
+    # differs from (1, 2) with target 1.
+    assert np.array_equal(X_u, [[1, 2], [3, 4], [1, 2], [0, 0]])
+    assert np.array_equal(Y_u, [1, 2, 5, 3])
+    assert np.array_equal(W, [2, 2, 1, 1])
+    assert np.array_equal(inverse, [0, 0, 1, 2, 1, 3])
+    assert np.array_equal(X_u[inverse], X)
+
+
+def test_compact_sums_weights():
+    _, _, W, _ = compact(X, Y, sample_weight=[0.5, 0.25, 1, 1, 1, 2])
+    assert np.allclose(W, [0.75, 2, 1, 2])
+
+
+def test_weighted_fit_matches_duplicated_fit():
+    rng = np.random.RandomState(0)
+    X_small = rng.randint(0, 3, size=(40, 4)).astype(float)
+    Y_small = X_small[:, 0] + rng.randint(0, 2, size=40)
+    X_dup = np.vstack([X_small] * 3 + [X_small[:10]])
+    Y_dup = np.concatenate([Y_small] * 3 + [Y_small[:10]])
+
+    X_u, Y_u, W, _ = compact(X_dup, Y_dup)
+    assert len(X_u) <= 40
+
+    raw = DecisionTreeRegressor(random_state=0).fit(X_dup, Y_dup)
+    compacted = DecisionTreeRegressor(random_state=0).fit(X_u, Y_u,
+                                                          sample_weight=W)
+    grid = rng.randint(0, 3, size=(100, 4)).astype(float)
+    assert np.allclose(raw.predict(grid), compacted.predict(grid))
+
+
+def test_compact_sparse_matches_dense():
+    from scipy import sparse
+
+    X = np.array([[0, 1, 0], [2, 0, 0], [0, 1, 0], [0, 1, 0], [2, 0, 0]],
+                 dtype=float)
+    Y = np.array([1., 2., 1., 3., 2.])
+    W = np.array([1., 2., 3., 4., 5.])
+    X_u, Y_u, weights, inverse = compact(sparse.csr_matrix(X), Y, W)
+    X_d, Y_d, weights_d, inverse_d = compact(X, Y, W)
+
+    assert sparse.issparse(X_u)
+    assert np.array_equal(X_u.toarray(), X_d)
+    assert np.array_equal(Y_u, Y_d)
+    assert np.array_equal(weights, weights_d)
+    assert np.array_equal(inverse, inverse_d)
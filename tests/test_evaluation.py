@@ -0,0 +1,79 @@
+from gsdash.evaluation import evaluate, format_report
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+
+import numpy as np
+import os
+
+rng = np.random.RandomState(0)
+X = rng.random_sample((150, 4))
+Y = 3 * X[:, 0] + rng.normal(scale=0.3, size=150)
+
+
+def test_oob_for_bagged_forest():
+    mdl = RandomForestRegressor(n_estimators=50, random_state=0)
+    metrics = evaluate(mdl, X, Y)
+    assert metrics['method'] == 'oob'
+    assert metrics['n'] == 150
+    assert 0.5 < metrics['r2'] < 1
+    # Only a clone is fit; the caller's model is left unfitted.
+    assert not hasattr(mdl, 'estimators_')
+    assert set(metrics['coverage'].keys()) == {50, 80, 95}
+    assert metrics['coverage'][50] <= metrics['coverage'][95]
+
+
+def test_cv_for_unbagged_models(tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    mdl = GradientBoostingRegressor(n_estimators=20, random_state=0)
+    metrics = evaluate(mdl, X, Y, cv=3, n_jobs=1, cache_dir=cache_dir)
+    assert metrics['method'] == 'cv'
+    assert np.isnan(metrics['coverage'][95])
+
+    files = sorted(os.listdir(cache_dir))
+    assert len([f for f in files if f.startswith('cv-')]) == 3
+    assert len([f for f in files if f.startswith('folds-')]) == 1
+
+    # A second run is served from the cache.
+    cached = evaluate(mdl, X, Y, cv=3, n_jobs=1, cache_dir=cache_dir)
+    assert cached['r2'] == metrics['r2']
+    assert sorted(os.listdir(cache_dir)) == files
+
+
+def test_cache_is_keyed_on_percentiles(tmpdir):
+    cache_dir = str(tmpdir.join('cache'))
+    for mdl in [RandomForestRegressor(n_estimators=20, random_state=0),
+                RandomForestRegressor(n_estimators=20, bootstrap=False,
+                                      random_state=0)]:
+        evaluate(mdl, X, Y, cv=3, n_jobs=1, cache_dir=cache_dir)
+        cached = evaluate(mdl, X, Y, cv=3, n_jobs=1, cache_dir=cache_dir,
+                          percentiles=(99,))
+        fresh = evaluate(mdl, X, Y, cv=3, n_jobs=1, percentiles=(99,))
+        assert cached['coverage'] == fresh['coverage']
+
+
+def test_unbootstrapped_forest_is_cross_validated():
+    mdl = RandomForestRegressor(n_estimators=10, bootstrap=False,
+                                random_state=0)
+    metrics = evaluate(mdl, X, Y, cv=3, n_jobs=1)
+    assert metrics['method'] == 'cv'
+    assert not np.isnan(metrics['coverage'][95])
+
+
+def test_format_report():
+    metrics = dict(FPV=dict(method='oob', n=10, r2=0.5, rmse=0.1,
+                            coverage={50: 0.4, 95: 0.9}))
+    report = format_report(metrics)
+    assert 'cov95' in report
+    assert 'FPV' in report
+
+
+def test_sparse_features():
+    from scipy import sparse
+
+    X_sparse = sparse.csr_matrix(np.where(X > 0.5, X, 0))
+    for mdl in [RandomForestRegressor(n_estimators=20, random_state=0),
+                GradientBoostingRegressor(n_estimators=20, random_state=0)]:
+        metrics = evaluate(mdl, X_sparse, Y, cv=3, n_jobs=1)
+        dense = evaluate(mdl, X_sparse.toarray(), Y, cv=3, n_jobs=1)
+        # Sparse and dense tree splitters break ties differently.
+        assert metrics['method'] == dense['method']
+        assert abs(metrics['r2'] - dense['r2']) < 0.01
@@ -0,0 +1,56 @@
+from flask import Flask, jsonify, request
+from gsdash.loadgen import (client_sender, http_sender, latency_curve,
+                            latency_summary)
+from threading import Thread
+from werkzeug.serving import make_server
+
+import numpy as np
+
+app = Flask(__name__)
+
+
+@app.route('/echo', methods=['POST'])
+def echo():
+    body = request.get_json(force=True)
+    if body['n'] < 0:
+        return jsonify(error='negative'), 400
+    return jsonify(n=body['n'])
+
+
+def test_latency_summary():
+    latencies = [0.01] * 98 + [1.0, 2.0]
+    statuses = [200] * 99 + [500]
+    summary = latency_summary(latencies, statuses, elapsed=2.0)
+    assert summary['requests'] == 100
+    assert summary['errors'] == 1
+    assert summary['throughput'] == 99 / 2.0
+    assert np.isclose(summary['p50'], 10)
+    assert summary['p99'] > 10
+
+    summary = latency_summary([0.1], [None], elapsed=0.1)
+    assert summary['errors'] == 1
+    assert summary['p50'] is None
+
+
+def test_client_sender_curve():
+    send = client_sender(app, '/echo', [dict(n=1), dict(n=-1)])
+    curve = latency_curve(send, [1, 3], n_requests=20)
+    assert [level['concurrency'] for level in curve] == [1, 3]
+    for level in curve:
+        assert level['requests'] == 20
+        # Payloads alternate between a good and a bad request.
+        assert level['errors'] == 10
+
+
+def test_http_sender():
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        url = 'http://127.0.0.1:{0}/echo'.format(server.server_port)
+        send = http_sender(url, [dict(n=1), dict(n=-1)])
+        assert send() == 200
+        assert send() == 400
+    finally:
+        server.shutdown()
+        thread.join()
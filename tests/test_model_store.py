@@ -0,0 +1,230 @@
+from gsdash.model_store import (ModelStore, write_manifest, latest_version,
+                                migrate_legacy)
+from threading import Barrier, Thread
+
+import gc
+import os
+import pickle
+import pytest
+import time
+import weakref
+
+drugs = ['FPV', 'ATV', 'IDV']
+
+
+class StandInModel(object):
+    """
+    A weak-referenceable stand-in for a trained model.
+    """
+    def __init__(self, drug, version):
+        self.drug = drug
+        self.version = version
+
+
+def pickle_loader(path):
+    with open(path, 'rb') as f:
+        drug, version = pickle.load(f)
+    return StandInModel(drug, version)
+
+
+def make_version(root, version, fast_trees=None):
+    version_dir = os.path.join(str(root), version)
+    os.makedirs(version_dir)
+    drug_files = list()
+    for drug in drugs:
+        fname = '{0}.pkl'.format(drug)
+        with open(os.path.join(version_dir, fname), 'wb') as f:
+            pickle.dump((drug, version), f)
+        drug_files.append((drug, fname))
+    return write_manifest(version_dir, drug_files, '2017-02-01',
+                          fast_trees=fast_trees)
+
+
+def test_latest_version_requires_manifest(tmpdir):
+    make_version(tmpdir, 'v1')
+    os.makedirs(os.path.join(str(tmpdir), 'v2'))
+    assert latest_version(str(tmpdir)) == 'v1'
+    assert latest_version(str(tmpdir.join('missing'))) is None
+
+
+def test_check_swaps_to_latest(tmpdir):
+    make_version(tmpdir, 'v1')
+    store = ModelStore(str(tmpdir), loader=pickle_loader)
+    assert store.get().version == 'v1'
+    assert store.get().drugs == drugs
+    assert not store.check()
+
+    make_version(tmpdir, 'v2')
+    assert store.check()
+    assert [m.version for m in store.get().models] == ['v2'] * 3
+
+
+def test_fast_trees(tmpdir):
+    make_version(tmpdir, 'v1', fast_trees={'FPV': 150, 'IDV': 300})
+    assert ModelStore(str(tmpdir), loader=pickle_loader).get().fast_trees\
+        == [150, None, 300]
+
+
+def tamper(root, version):
+    with open(str(root.join(version, 'FPV.pkl')), 'wb') as f:
+        pickle.dump(('FPV', 'tampered'), f)
+
+
+def test_hash_mismatch_keeps_old_version(tmpdir):
+    make_version(tmpdir, 'v1')
+    store = ModelStore(str(tmpdir), loader=pickle_loader)
+    store.get()
+
+    make_version(tmpdir, 'v2')
+    tamper(tmpdir, 'v2')
+    assert not store.check()
+    assert store.get().version == 'v1'
+    assert list(store.failed) == ['v2']
+
+
+def test_falls_back_to_older_version(tmpdir):
+    loaded = list()
+
+    def counting_loader(path):
+        loaded.append(path)
+        return pickle_loader(path)
+
+    make_version(tmpdir, 'v1')
+    make_version(tmpdir, 'v2')
+    tamper(tmpdir, 'v2')
+    store = ModelStore(str(tmpdir), loader=counting_loader)
+    assert store.get().version == 'v1'
+
+    # The failed version is not hashed or loaded again on later polls...
+    n_loaded = len(loaded)
+    assert not store.check()
+    assert len(loaded) == n_loaded
+
+    # ... until it is redeployed with a new manifest.
+    write_manifest(str(tmpdir.join('v2')),
+                   [(drug, '{0}.pkl'.format(drug)) for drug in drugs],
+                   '2017-02-01')
+    # Make sure the mtime changes, however coarse the filesystem clock.
+    os.utime(str(tmpdir.join('v2', 'manifest.json')), (1e9, 1e9))
+    assert store.check()
+    assert store.get().version == 'v2'
+
+
+def test_no_loadable_versions(tmpdir):
+    make_version(tmpdir, 'v1')
+    tamper(tmpdir, 'v1')
+    with pytest.raises(IOError):
+        ModelStore(str(tmpdir), loader=pickle_loader).get()
+
+
+def test_watcher_preloads(tmpdir):
+    make_version(tmpdir, 'v1')
+    store = ModelStore(str(tmpdir), loader=pickle_loader, interval=60)
+    store.start_watcher()
+    try:
+        for i in range(500):
+            if store.current is not None:
+                break
+            time.sleep(0.01)
+        # Loaded by the watcher, before any request.
+        assert store.current.version == 'v1'
+    finally:
+        store.stop_watcher()
+
+
+def test_no_versions(tmpdir):
+    store = ModelStore(str(tmpdir), loader=pickle_loader)
+    with pytest.raises(IOError):
+        store.get()
+
+
+def test_swap_during_concurrent_requests(tmpdir):
+    """
+    Requests that started before a swap finish on the old version, requests
+    that start after it see the new one, and the old models are only freed
+    once the in-flight requests are done.
+    """
+    make_version(tmpdir, 'v1')
+    store = ModelStore(str(tmpdir), loader=pickle_loader)
+    old = weakref.ref(store.get())
+
+    n_requests = 8
+    started = Barrier(n_requests + 1)
+    swapped = Barrier(n_requests + 1)
+    seen = list()
+
+    def request():
+        model_set = store.get()
+        started.wait()
+        swapped.wait()
+        # Use the model set after the swap has happened.
+        seen.append({m.version for m in model_set.models})
+
+    threads = [Thread(target=request) for i in range(n_requests)]
+    for t in threads:
+        t.start()
+
+    started.wait()
+    make_version(tmpdir, 'v2')
+    assert store.check()
+    gc.collect()
+    assert old() is not None
+    swapped.wait()
+
+    for t in threads:
+        t.join()
+    gc.collect()
+
+    assert seen == [{'v1'}] * n_requests
+    assert old() is None
+    assert {m.version for m in store.get().models} == {'v2'}
+
+
+def test_watcher(tmpdir):
+    make_version(tmpdir, 'v1')
+    store = ModelStore(str(tmpdir), loader=pickle_loader, interval=0.01)
+    store.get()
+    store.start_watcher()
+    try:
+        make_version(tmpdir, 'v2')
+        for i in range(500):
+            if store.get().version == 'v2':
+                break
+            time.sleep(0.01)
+        assert store.get().version == 'v2'
+    finally:
+        store.stop_watcher()
+
+
+def test_multioutput_file_loaded_once(tmpdir):
+    version_dir = str(tmpdir.join('v1'))
+    os.makedirs(version_dir)
+    with open(os.path.join(version_dir, 'protease.pkl'), 'wb') as f:
+        pickle.dump(('all', 'v1'), f)
+    write_manifest(version_dir, [(drug, 'protease.pkl', i)
+                                 for i, drug in enumerate(drugs)],
+                   '2017-02-01')
+
+    model_set = ModelStore(str(tmpdir), loader=pickle_loader).get()
+    assert model_set.drugs == drugs
+    assert model_set.outputs == [0, 1, 2]
+    assert len({id(m) for m in model_set.models}) == 1
+
+
+def test_migrate_legacy(tmpdir):
+    base = tmpdir.mkdir('base')
+    for drug in drugs[:2]:
+        path = base.mkdir(drug).join('{0}.pkl'.format(drug))
+        with open(str(path), 'wb') as f:
+            pickle.dump((drug, 'base'), f)
+
+    version = migrate_legacy(str(tmpdir), drugs)
+    assert latest_version(str(tmpdir)) == version
+    model_set = ModelStore(str(tmpdir), loader=pickle_loader).get()
+    assert model_set.drugs == drugs[:2]
+    assert [m.version for m in model_set.models] == ['base', 'base']
+
+    # A later retrained version takes precedence.
+    make_version(tmpdir, '9999-01-01T000000')
+    assert latest_version(str(tmpdir)) == '9999-01-01T000000'
+    assert migrate_legacy(str(tmpdir.mkdir('empty')), drugs) is None
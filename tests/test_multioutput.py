@@ -0,0 +1,36 @@
+from gsdash.multioutput import fit_multioutput_forest
+from gsdash.predutils import predictions, multioutput_pred_range
+
+import numpy as np
+
+np.random.seed(0)
+X = np.random.random((200, 5))
+Y = np.column_stack([X[:, 0] * 2, X[:, 1] - X[:, 2]])
+Y_missing = Y.copy()
+Y_missing[::3, 1] = np.nan
+
+
+def test_fit_multioutput_forest_imputes_missing_targets():
+    mdl, Y_imputed = fit_multioutput_forest(X, Y_missing, n_estimators=20,
+                                            random_state=0)
+    assert not np.isnan(Y_imputed).any()
+    # Observed targets are left untouched.
+    observed = ~np.isnan(Y_missing)
+    assert np.allclose(Y_imputed[observed], Y[observed])
+    # OOB imputation beats imputing with the mean.
+    missing = ~observed
+    mean_err = np.abs(np.nanmean(Y_missing[:, 1]) - Y[missing]).mean()
+    assert np.abs(Y_imputed[missing] - Y[missing]).mean() < mean_err
+    assert mdl.predict(X[:3]).shape == (3, 2)
+
+
+def test_predictions_share_multioutput_pass():
+    mdl, _ = fit_multioutput_forest(X, Y_missing, n_estimators=10,
+                                    random_state=0)
+    prange = multioutput_pred_range(mdl, X[:1])
+    assert prange.shape == (10, 2)
+
+    preds = predictions(['A', 'B'], [mdl, mdl], X[:1], outputs=[0, 1])
+    b = [p['log10(DR)'] for p in preds if p['drug'] == 'B']
+    assert np.allclose(b, prange[:, 1])
+    assert np.isclose(np.mean(b), mdl.predict(X[:1])[0, 1])
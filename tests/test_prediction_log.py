@@ -0,0 +1,52 @@
+import numpy as np
+from gsdash.prediction_log import PredictionLog
+
+seq1 = 'PQITLWQRPLVTIKIGGQLKEALLDTGADDTVLEEMSLPGRWKPKMIGGIGGFIKVRQYD'
+seq2 = 'PQITLWQRPLVTIKIGGQLKEALLDTGADDTVLEEMNLPGRWKPKMIGGIGGFIKVRQYD'
+hour = 3600.
+
+
+def make_log():
+    log = PredictionLog(':memory:', cutoff=1.0, bucket_seconds=hour)
+    log.record(seq1, {'FPV': 0.5, 'ATV': 1.5}, ts=10 * hour)
+    log.record(seq2, {'FPV': 1.2, 'ATV': 0.2}, ts=11 * hour)
+    log.record(seq1, {'FPV': 2.0, 'ATV': 1.8}, ts=12 * hour)
+    return log
+
+
+def test_summary_window():
+    log = make_log()
+    s = log.summary(window=3 * hour, now=12.5 * hour)
+    assert s['FPV']['n'] == 3
+    assert np.isclose(s['FPV']['mean'], np.mean([0.5, 1.2, 2.0]))
+    assert np.isclose(s['FPV']['std'], np.std([0.5, 1.2, 2.0]))
+    assert np.isclose(s['FPV']['fraction_above'], 2 / 3)
+
+    # Only the last bucket falls within a one hour window.
+    s = log.summary(window=hour, now=12.5 * hour)
+    assert s['ATV']['n'] == 1
+    assert log.fraction_above('ATV', hour, now=12.5 * hour) == 1.0
+    assert np.isnan(log.fraction_above('DRV', hour, now=12.5 * hour))
+
+
+def test_distribution():
+    log = make_log()
+    bins, counts = log.distribution('FPV', 3 * hour, now=12.5 * hour)
+    assert counts.sum() == 3
+    assert counts[np.searchsorted(bins, 2.0, side='right') - 1] == 1
+
+
+def test_history():
+    log = make_log()
+    assert [drug for ts, drug, v in log.history(seq1)].count('FPV') == 2
+    assert len(log.history(seq2.lower())) == 2
+
+
+def test_sequence_stored_once():
+    log = make_log()
+    # The same sequence, pasted with surrounding whitespace and lower-case.
+    log.record(' {0}\n'.format(seq2.lower()), {'FPV': 0.1}, ts=12 * hour)
+    assert log._conn.execute('SELECT sequence FROM sequences '
+                             'ORDER BY sequence').fetchall() == \
+        sorted([(seq1,), (seq2,)])
+    assert len(log.history(seq2 + '\n')) == 3
@@ -0,0 +1,94 @@
+from gsdash.alignment import read_fasta_sequence
+from gsdash.model_store import write_manifest
+from gsdash.sequence_transformer import to_numeric_rep
+from sklearn.ensemble import RandomForestRegressor
+
+import joblib
+import numpy as np
+import os
+import pytest
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+consensus = read_fasta_sequence(os.path.join(root, 'data',
+                                             'hiv-protease-consensus.fasta'))
+drugs = ['FPV', 'ATV']
+
+
+def make_stand_in_version(version_dir):
+    """
+    Writes small forests, fit on point mutants of the consensus, as a model
+    version.
+    """
+    rng = np.random.RandomState(0)
+    sequences = [consensus[:i] + 'W' + consensus[i + 1:] for i in range(99)]
+    X = np.array([to_numeric_rep(s, 'mw') for s in sequences])
+    drug_files = list()
+    for drug in drugs:
+        mdl = RandomForestRegressor(n_estimators=8, random_state=0)
+        mdl.fit(X, rng.normal(size=len(X)))
+        fname = '{0}.pkl'.format(drug)
+        joblib.dump(mdl, str(version_dir.join(fname)))
+        drug_files.append((drug, fname))
+    write_manifest(str(version_dir), drug_files, '2017-02-01',
+                   fast_trees={drug: 2 for drug in drugs})
+
+
+@pytest.fixture
+def client(tmpdir, monkeypatch):
+    # Keep the predictor off the real prediction log and models.
+    monkeypatch.setenv('PREDICTOR_LOG', str(tmpdir.join('log.sqlite')))
+    models = tmpdir.mkdir('models')
+    monkeypatch.setenv('PREDICTOR_MODELS', str(models))
+    make_stand_in_version(models.mkdir('v1'))
+    monkeypatch.syspath_prepend(os.path.join(root, 'app'))
+    # The predictor reads the consensus from ../data.
+    monkeypatch.chdir(os.path.join(root, 'app'))
+    sys.modules.pop('predictor', None)
+    import predictor
+
+    yield predictor.predictor.test_client()
+    predictor.model_store.stop_watcher()
+    predictor.prediction_log.close()
+    sys.modules.pop('predictor', None)
+
+
+def test_surveillance_hours(client):
+    assert client.get('/surveillance?hours=2').status_code == 200
+    for hours in ['abc', '-1', '0', 'nan', 'inf']:
+        response = client.get('/surveillance?hours={0}'.format(hours))
+        assert response.status_code == 400
+
+
+def test_rejects_unaligned_input(client):
+    for sequence in ['', 'PQITLWQRPL', 'W' * 99]:
+        response = client.post('/predict', data=dict(sequence=sequence))
+        assert response.status_code == 400
+        response = client.post('/predict/batch',
+                               json=dict(sequences=[sequence]))
+        assert response.status_code == 400
+        assert 'sequences [0]' in response.get_json()['error']
+
+
+def test_predict_batch(client):
+    mutant = consensus[:10] + 'W' + consensus[11:]
+    for mode in ['full', 'fast']:
+        response = client.post('/predict/batch', json=dict(
+            sequences=[consensus, mutant + '\n'], mode=mode))
+        assert response.status_code == 200
+        body = response.get_json()
+        assert body['version'] == 'v1'
+        assert len(body['predictions']) == 2
+        for result in body['predictions']:
+            assert sorted(result) == sorted(drugs)
+            for r in result.values():
+                assert r['low'] <= r['mean'] <= r['upp']
+
+
+def test_predict_batch_validates_body(client):
+    for body in [dict(), dict(sequences=[]), dict(sequences=consensus),
+                 dict(sequences=[consensus, 3]), [consensus]]:
+        response = client.post('/predict/batch', json=body)
+        assert response.status_code == 400
+    response = client.post('/predict/batch', data='not json')
+    assert response.status_code == 400
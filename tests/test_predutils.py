@@ -0,0 +1,28 @@
+from gsdash.predutils import batch_predictions, point_predictions
+from sklearn.ensemble import RandomForestRegressor
+
+import numpy as np
+
+
+def test_point_predictions():
+    preds = [{'drug': 'FPV', 'log10(DR)': 1.0},
+             {'drug': 'FPV', 'log10(DR)': 2.0},
+             {'drug': 'ATV', 'log10(DR)': 0.5}]
+    assert point_predictions(preds) == {'FPV': 1.5, 'ATV': 0.5}
+
+
+def test_batch_predictions():
+    rng = np.random.RandomState(0)
+    X = rng.rand(50, 4)
+    mdl = RandomForestRegressor(n_estimators=20, random_state=0)
+    mdl.fit(X, X[:, 0])
+    multi = RandomForestRegressor(n_estimators=20, random_state=0)
+    multi.fit(X, X[:, :2])
+
+    preds = batch_predictions(['A', 'B', 'C'], [mdl, multi, multi], X[:5],
+                              outputs=[None, 0, 1], n_trees=[None, 10, 10])
+    assert np.allclose(preds['A']['mean'], mdl.predict(X[:5]))
+    assert (preds['A']['low'] <= preds['A']['mean']).all()
+    assert (preds['A']['mean'] <= preds['A']['upp']).all()
+    subset = np.array([est.predict(X[:5]) for est in multi.estimators_[:10]])
+    assert np.allclose(preds['C']['mean'], subset[:, :, 1].mean(axis=0))
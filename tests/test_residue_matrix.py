@@ -0,0 +1,46 @@
+import gsdash.residue_matrix as rm
+import numpy as np
+import os
+
+data_dir = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'data')
+
+
+def test_encode_decode_roundtrip():
+    seq = 'PQITLW.-*#~+'
+    codes = rm.encode(seq)
+    assert codes.dtype == np.uint8
+    assert rm.decode(codes) == seq
+    assert rm.encode('x')[0] == rm.UNKNOWN
+    assert rm.encode('l')[0] == rm.encode('L')[0]
+
+
+def test_read_sparse_file():
+    data = rm.read_residue_data(
+        os.path.join(data_dir, 'hiv-protease-data-sparse.csv'), 8)
+    assert data.residues.shape == (1808, 99)
+    assert data.drug_values.shape == (1808, 8)
+    assert data.drug_cols[0] == 'FPV'
+    assert data.feat_cols[-1] == 'P99'
+    # The first row: SeqID 2996, FPV = 2.5, ATV = NA, mixture 'FL' at P53.
+    assert data.seqids[0] == '2996'
+    assert data.drug_values[0, 0] == 2.5
+    assert np.isnan(data.drug_values[0, 1])
+    assert data.mixtures[(0, 52)] == 'FL'
+    assert data.residues[0, 52] == rm.MIXTURE
+    assert (data.residues == rm.MIXTURE).sum() == len(data.mixtures)
+
+
+def test_sparse_matches_dense_after_filling_consensus():
+    sparse = rm.read_residue_data(
+        os.path.join(data_dir, 'hiv-protease-data-sparse.csv'), 8)
+    dense = rm.read_residue_data(
+        os.path.join(data_dir, 'hiv-protease-data.csv'), 8)
+    with open(os.path.join(data_dir, 'hiv-protease-consensus.fasta')) as f:
+        consensus = ''.join(f.read().splitlines()[1:])
+    filled = rm.fill_consensus(sparse.residues, consensus)
+    assert not (filled == rm.CONSENSUS).any()
+    # The dense file has mixtures and stops/unknowns blanked out.
+    known = (dense.residues != rm.UNKNOWN) & (filled != rm.MIXTURE)
+    assert np.array_equal(filled[known], dense.residues[known])
+    assert np.allclose(sparse.drug_values, dense.drug_values, equal_nan=True)
@@ -0,0 +1,136 @@
+from gsdash.sequence_store import (SequenceStore, pack5, sequence_hashes,
+                                   unpack5)
+from gsdash.sparse_encoding import onehot_encode
+import gsdash.residue_matrix as rm
+import numpy as np
+import pytest
+
+
+def test_add_and_find():
+    # A small initial capacity, so that the buffers and the table grow.
+    store = SequenceStore(capacity=2, length=4)
+    indices = store.add_many(['PQIT', 'AC', 'PQIT', ''])
+    assert list(indices) == [0, 1, 0, 2]
+    assert len(store) == 3
+    assert list(store.counts) == [2, 1, 1]
+    assert store.find('AC') == 1
+    assert store.find('') == 2
+    assert store.find('ACD') is None
+    assert 'PQIT' in store
+
+    for i in range(100):
+        assert store.add('P' * i + 'W') == 3 + i
+    assert store.find('P' * 50 + 'W') == 53
+    assert store.sequence(53) == 'P' * 50 + 'W'
+    assert store.find('PQIT') == 0
+
+
+def test_rejects_non_canonical():
+    store = SequenceStore()
+    store.add_many(['PQ.T', 'PQ-T', 'PQ*T', 'PQ#T', 'PQ~T'])
+    assert len(store) == 5
+    assert store.sequence(0) == 'PQ.T'
+
+    # None of these may merge with 'PQ.T' through the unknown code.
+    for sequence in ['pqit', 'PQXT', 'PQBT', 'PQZT', 'PQJT', 'PQOT', 'PQUT',
+                     'PQ1T', 'PQ T', 'PQ+T', 'PQ\u00e9T']:
+        with pytest.raises(ValueError):
+            store.add(sequence)
+        with pytest.raises(ValueError):
+            store.find(sequence)
+        assert sequence not in store
+    # A bad sequence anywhere in a batch adds nothing.
+    with pytest.raises(ValueError):
+        store.add_many(['WWW', 'PQXT'])
+    assert len(store) == 5
+
+    # Mixtures need their letters.
+    with pytest.raises(ValueError):
+        store.add_codes(np.array([[1, 2, rm.MIXTURE]]))
+    with pytest.raises(ValueError):
+        store.add_codes(np.array([[1, 2, rm.MIXTURE]]),
+                        mixtures={(0, 2): ''})
+    with pytest.raises(ValueError):
+        store.add_codes(np.array([[1, 2, 3]]), mixtures={(0, 2): 'IV'})
+    assert len(store) == 5
+
+
+def test_mixtures():
+    store = SequenceStore(capacity=2, length=4)
+    residues = np.array([rm.encode('PQ+T'), rm.encode('PQ+T'),
+                         rm.encode('PQ+T'), rm.encode('PQIT')])
+    mixtures = {(0, 2): 'IV', (1, 2): 'IL', (2, 2): 'VI'}
+    # Only the letters tell the first three apart; their order does not.
+    assert list(store.add_codes(residues, mixtures=mixtures)) == [0, 1, 0, 2]
+    assert store.mixtures(1) == {2: 'IL'}
+    assert store.mixtures(2) == dict()
+    assert store.sequence(0) == 'PQ+T'
+    assert store.find('PQIT') == 2
+    with pytest.raises(ValueError):
+        store.find('PQ+T')
+
+    # Mixture cells are kept when growing, and round-trip to the encoders.
+    more = {(k, 1): 'KR' for k in range(20)}
+    store.add_codes(np.array([rm.encode('P+{0}'.format(a))
+                              for a in rm.AMINO_ACIDS]), mixtures=more)
+    assert store.mixtures(22) == {1: 'KR'}
+    assert store.row_mixtures(1, 4) == {(0, 2): 'IL', (2, 1): 'KR'}
+    assert np.array_equal(
+        onehot_encode(store.rows(0, 2), store.row_mixtures(0, 2)).toarray(),
+        onehot_encode(residues[:2], {(0, 2): 'IV', (1, 2): 'IL'}).toarray())
+
+
+def test_hashes():
+    codes = rm.encode('ACAC.')
+    hashes = sequence_hashes(codes, [0, 2, 4, 4, 5])
+    # Equal sequences hash equal; the empty and unknown-only ones differ.
+    assert hashes[0] == hashes[1]
+    assert len(set(hashes[1:].tolist())) == 3
+
+
+def test_views_are_zero_copy():
+    store = SequenceStore()
+    residues = np.array([rm.encode('PQITLW'), rm.encode('PQVTLW'),
+                         rm.encode('PQITLW')])
+    assert list(store.add_codes(residues)) == [0, 1, 0]
+    rows = store.rows()
+    assert rows.shape == (2, 6)
+    assert np.shares_memory(rows, store.codes(1))
+    assert not rows.flags.writeable
+    assert np.array_equal(onehot_encode(rows).toarray(),
+                          onehot_encode(residues[:2]).toarray())
+
+    store.add('AC')
+    with pytest.raises(ValueError):
+        store.rows()
+
+
+def test_pack5_roundtrip():
+    codes = np.random.RandomState(0).randint(0, 26, 1001).astype(np.uint8)
+    packed = pack5(codes)
+    assert len(packed) == 126 * 5
+    assert np.array_equal(unpack5(packed, len(codes)), codes)
+
+
+@pytest.mark.parametrize('packed', [False, True])
+def test_save_load(tmpdir, packed):
+    store = SequenceStore(capacity=4)
+    store.add_many(['PQIT', 'AC', 'PQIT', 'WWW'])
+    store.add_codes(np.array([rm.encode('P+')]), mixtures={(0, 1): 'QK'})
+    store.save(str(tmpdir), packed=packed)
+
+    loaded = SequenceStore.load(str(tmpdir))
+    assert len(loaded) == 4
+    assert loaded.find('WWW') == 2
+    assert loaded.sequence(1) == 'AC'
+    assert loaded.mixtures(3) == {1: 'KQ'}
+    assert list(loaded.counts) == [2, 1, 1, 1]
+
+    # A memory-mapped store can still be added to.
+    assert loaded.add('PQIT') == 0
+    assert loaded.add('NEW') == 4
+    assert list(loaded.add_codes(np.array([rm.encode('P+')] * 2),
+                                 mixtures={(0, 1): 'KQ', (1, 1): 'KR'})) \
+        == [3, 5]
+    assert list(loaded.counts) == [3, 1, 1, 2, 1, 1]
+    assert SequenceStore.load(str(tmpdir)).find('NEW') is None
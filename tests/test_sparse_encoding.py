@@ -0,0 +1,57 @@
+from gsdash.sparse_encoding import (N_CODES, kmer_encode, onehot_encode,
+                                    sparse_encode)
+from sklearn.ensemble import RandomForestRegressor
+import gsdash.residue_matrix as rm
+import numpy as np
+
+
+def dense_onehot(residues):
+    n_rows, n_positions = residues.shape
+    X = np.zeros((n_rows, n_positions, N_CODES))
+    for i in range(n_rows):
+        for j in range(n_positions):
+            if residues[i, j] != rm.UNKNOWN:
+                X[i, j, residues[i, j]] = 1
+    return X.reshape(n_rows, -1)
+
+
+def test_onehot_matches_dense():
+    residues = np.array([rm.encode('PQIT.W'), rm.encode('PQ*TLW'),
+                         rm.encode('AQ+~LW')])
+    X = onehot_encode(residues)
+    assert X.format == 'csr'
+    assert X.shape == (3, 6 * N_CODES)
+    assert np.array_equal(X.toarray(), dense_onehot(residues))
+
+
+def test_onehot_mixtures():
+    residues = np.array([rm.encode('PQITLWPQIT+T')])
+    X = onehot_encode(residues, mixtures={(0, 10): 'IV'}).toarray()
+    start = 10 * N_CODES
+    assert X[0, start + rm.MIXTURE] == 0
+    assert X[0, start + rm.ALPHABET.index('I')] == 0.5
+    assert X[0, start + rm.ALPHABET.index('V')] == 0.5
+    assert X.sum() == 12
+
+
+def test_kmer_counts():
+    residues = np.array([rm.encode('ACAC.A'), rm.encode('AAAAAA')])
+    X = kmer_encode(residues, k=2).toarray()
+    assert X.shape == (2, 400)
+    # 'AC' is 0 * 20 + 1, 'CA' is 1 * 20 + 0, 'AA' is 0.
+    assert X[0, 1] == 2
+    assert X[0, 20] == 1
+    assert X[0].sum() == 3
+    assert X[1, 0] == 5
+
+
+def test_forest_accepts_sparse():
+    rng = np.random.RandomState(0)
+    residues = rng.randint(1, 21, size=(60, 10)).astype(np.uint8)
+    Y = (residues[:, 3] == 5).astype(float)
+    X = sparse_encode(residues, k=2)
+    mdl = RandomForestRegressor(n_estimators=10, random_state=0)
+    mdl.fit(X, Y)
+    assert np.allclose(mdl.predict(X), mdl.predict(X.toarray()))
+    assert np.allclose(mdl.estimators_[0].predict(X[:1]),
+                       mdl.estimators_[0].predict(X.toarray()[:1]))
@@ -0,0 +1,61 @@
+"""
+Guards the import-time budget of the gsdash package and the predictor.
+
+Each check runs in a fresh interpreter so that modules imported by other tests
+do not hide a regression.
+"""
+import os
+import pytest
+import subprocess
+import sys
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+heavy_modules = ['pandas', 'scipy', 'sklearn', 'bokeh', 'Bio']
+
+# Generous wall-clock budget (seconds) for the import, measured in-process so
+# that interpreter startup is excluded.
+budget = 1.5
+
+probe = """
+import sys, time
+sys.path.insert(0, {path!r})
+t = time.time()
+import {module}
+elapsed = time.time() - t
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(elapsed, ','.join(heavy))
+"""
+
+
+def import_in_subprocess(module, path=root, cwd=root):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([root, env.get('PYTHONPATH', '')])
+    out = subprocess.check_output(
+        [sys.executable, '-c', probe.format(module=module, path=path,
+                                            heavy=heavy_modules)],
+        cwd=cwd, env=env, universal_newlines=True)
+    elapsed, _, heavy = out.strip().splitlines()[-1].partition(' ')
+    return float(elapsed), [m for m in heavy.split(',') if m]
+
+
+@pytest.mark.parametrize('module', ['gsdash.sequence_transformer',
+                                    'gsdash.predutils',
+                                    'gsdash.bokehutils',
+                                    'gsdash.prediction_log'])
+def test_gsdash_imports_are_light(module):
+    elapsed, heavy = import_in_subprocess(module)
+    assert heavy == []
+    assert elapsed < budget
+
+
+def test_predictor_imports_are_light(tmpdir):
+    pytest.importorskip('flask')
+    # The predictor opens its prediction log relative to the working
+    # directory, so run it from a scratch app/ directory.
+    cwd = tmpdir.mkdir('app')
+    tmpdir.mkdir('data')
+    elapsed, heavy = import_in_subprocess('predictor',
+                                          path=os.path.join(root, 'app'),
+                                          cwd=str(cwd))
+    assert heavy == []
+    assert elapsed < budget
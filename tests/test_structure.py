@@ -0,0 +1,66 @@
+from gsdash.molecular_weight import molecular_weights as mw
+from gsdash.structure import (load_contact_graph, neighbourhood_features,
+                              neighbourhood_operator, value_table)
+from scipy import sparse
+import gsdash.residue_matrix as rm
+import gsdash.structure as structure
+import numpy as np
+import os
+
+pdb_path = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'data', 'hiv-protease.pdb')
+
+
+def test_contact_graph(tmpdir, monkeypatch):
+    cache_path = str(tmpdir.join('contacts.npz'))
+    adjacency = load_contact_graph(pdb_path, cutoff=4.0,
+                                   cache_path=cache_path)
+    assert adjacency.shape == (99, 99)
+    assert (adjacency != adjacency.T).nnz == 0
+    # Sequence neighbours are always in contact through the peptide bond.
+    assert all(adjacency[i, i + 1] for i in range(98))
+    # The flap tips (I50) of the two chains touch.
+    assert adjacency[49, 49] == 1
+    assert os.path.exists(cache_path)
+
+    # The file is reused for the same cutoff, without parsing the structure,
+    # and rebuilt for another one.
+    monkeypatch.setattr(structure, 'contact_graphs', dict())
+    build = structure.contact_graph
+    monkeypatch.setattr(structure, 'contact_graph', None)
+    cached = load_contact_graph(pdb_path, cutoff=4.0, cache_path=cache_path)
+    assert (cached != adjacency).nnz == 0
+    monkeypatch.setattr(structure, 'contact_graph', build)
+    wider = load_contact_graph(pdb_path, cutoff=4.5, cache_path=cache_path)
+    assert wider.nnz > adjacency.nnz
+    assert (wider != build(pdb_path, 4.5)).nnz == 0
+
+
+def test_neighbourhood_features():
+    # A chain graph: 0 - 1 - 2.
+    adjacency = sparse.csr_matrix(np.array([[0, 1, 0],
+                                            [1, 0, 1],
+                                            [0, 1, 0]]))
+    operator = neighbourhood_operator(adjacency)
+    residues = np.array([rm.encode('AGW'), rm.encode('A.W')])
+    features = neighbourhood_features(residues, operator)
+
+    assert np.allclose(features[0], [(mw['A'] + mw['G']) / 2,
+                                     (mw['A'] + mw['G'] + mw['W']) / 3,
+                                     (mw['G'] + mw['W']) / 2])
+    # The unknown position is left out of its neighbours' averages.
+    assert np.allclose(features[1], [mw['A'], (mw['A'] + mw['W']) / 2,
+                                     mw['W']])
+
+
+def test_batch_matches_single_rows():
+    operator = neighbourhood_operator(load_contact_graph(pdb_path))
+    rng = np.random.RandomState(0)
+    residues = rng.randint(1, 21, size=(5, 99)).astype(np.uint8)
+    features = neighbourhood_features(residues, operator)
+    for row, expected in zip(residues, features):
+        values = value_table()[row]
+        single = neighbourhood_features(row[None, :], operator)[0]
+        assert np.allclose(single, expected)
+        assert np.allclose(single[0],
+                           values[operator[0].indices].mean())
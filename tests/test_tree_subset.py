@@ -0,0 +1,49 @@
+from gsdash.tree_subset import (MIN_INPUTS, check_n_trees, select_n_trees,
+                                subset_deviation, tree_predictions)
+from gsdash.predutils import pred_range, predictions
+from sklearn.ensemble import RandomForestRegressor
+
+import numpy as np
+import pytest
+
+rng = np.random.RandomState(0)
+X = rng.random_sample((200, 5))
+Y = 2 * X[:, 0] + rng.normal(scale=0.2, size=200)
+mdl = RandomForestRegressor(n_estimators=400, random_state=0).fit(X, Y)
+X_holdout = rng.random_sample((MIN_INPUTS, 5))
+
+
+def test_subset_deviation_shrinks_with_more_trees():
+    tree_preds = tree_predictions(mdl, X_holdout)
+    assert tree_preds.shape == (400, MIN_INPUTS)
+    small = subset_deviation(tree_preds, 25)
+    large = subset_deviation(tree_preds, 300)
+    assert large[0] < small[0]
+    assert large[1] < small[1]
+    assert subset_deviation(tree_preds, 400) == (0, 0)
+
+
+def test_select_n_trees():
+    n_trees, deviations = select_n_trees(mdl, X_holdout, tolerance=0.05)
+    assert n_trees < 400
+    assert deviations[-1][0] == n_trees
+    # Selected with a safety margin below the tolerance.
+    assert deviations[-1][1] <= 0.04 and deviations[-1][2] <= 0.04
+    assert deviations[-2][2] > 0.04 or deviations[-2][1] > 0.04
+    assert check_n_trees(mdl, X_holdout, n_trees, tolerance=0.05)
+    assert not check_n_trees(mdl, X_holdout, 1, tolerance=0.05)
+    # An impossible tolerance keeps the whole forest.
+    assert select_n_trees(mdl, X_holdout, tolerance=0)[0] == 400
+
+
+def test_select_n_trees_warns_on_few_inputs():
+    with pytest.warns(UserWarning):
+        select_n_trees(mdl, X_holdout[:50])
+
+
+def test_fast_predictions_use_subset():
+    assert len(pred_range(mdl, X_holdout[:1], 25)) == 25
+    preds = predictions(['A', 'B'], [mdl, mdl], X_holdout[:1],
+                        n_trees=[25, None])
+    assert len([p for p in preds if p['drug'] == 'A']) == 25
+    assert len([p for p in preds if p['drug'] == 'B']) == 400